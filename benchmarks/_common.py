@@ -0,0 +1,62 @@
+"""
+Helpers shared by the benchmarks: command-line arguments, a silent logger, synthetic catalog pairs,
+timing and fixed-width result tables.
+"""
+import logging
+import re
+import sys
+import time
+
+from benchmarks.synthetic import generate_pair
+
+DB_TYPES = ("sqlserver", "mysql", "postgresql")
+
+_ALIGN_WIDTH = re.compile(r"[<>^]?\d*")
+
+
+def arg(index, default, convert=int):
+    """sys.argv[index] converted with `convert`, or `default` when it is not given."""
+    return convert(sys.argv[index]) if len(sys.argv) > index else default
+
+
+def int_args(start, default):
+    """Every argument from sys.argv[start] on as ints, or `default` when there are none."""
+    return [int(value) for value in sys.argv[start:]] or list(default)
+
+
+def quiet_logger(name):
+    """A logger whose records go nowhere, so benchmark output is only the results."""
+    logger = logging.getLogger(name)
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    return logger
+
+
+def synthetic_catalogs(object_count, db_type="sqlserver", **kwargs):
+    """A synthetic source/destination pair as {"source": ..., "destination": ...}, as FakeDBAdapter replays them."""
+    source, destination = generate_pair(object_count, db_type=db_type, **kwargs)
+    return {"source": source, "destination": destination}
+
+
+def timed(function, *args, **kwargs):
+    """(seconds, result) of one call."""
+    start = time.perf_counter()
+    value = function(*args, **kwargs)
+    return time.perf_counter() - start, value
+
+
+class Table:
+    """
+    A fixed-width result table. Columns are (header, format spec) pairs, e.g. ("total s", ">9.2f");
+    headers are printed with the spec's alignment and width only.
+    """
+
+    def __init__(self, *columns, separator=""):
+        self.columns = columns
+        self.separator = separator
+
+    def header(self):
+        print(self.separator.join(f"{name:{_ALIGN_WIDTH.match(spec).group()}}" for name, spec in self.columns))
+
+    def row(self, *values):
+        print(self.separator.join(f"{value:{spec}}" for value, (_, spec) in zip(values, self.columns)))
@@ -0,0 +1,55 @@
+"""
+Comparing one wide table: name-matched column comparison (comparator.diff_columns) vs. DeepDiff with
+ignore_order on the column lists, for a few changed, added, dropped and moved columns.
+
+Run from the repository root:  python -m benchmarks.bench_columns [column_counts...]
+"""
+import random
+import time
+
+from benchmarks._common import Table, int_args
+from comparator import diff_columns, diff_objects
+from metadata_model import record_type
+
+Column = record_type(("column", "data_type", "max_length"))
+DATA_TYPES = [("int", 4), ("bigint", 8), ("varchar", 255), ("nvarchar", 510), ("datetime2", 8)]
+
+
+def wide_table_pair(column_count, rng, changes=5):
+    source = [Column(f"col_{i}", *rng.choice(DATA_TYPES)) for i in range(column_count)]
+    destination = [Column(c.column, c.data_type, c.max_length) for c in source]
+    for _ in range(changes):
+        destination[rng.randrange(column_count)]["max_length"] = 4000
+    destination.insert(column_count // 2, Column("col_added", "int", 4))
+    del destination[column_count // 3]
+    destination.append(destination.pop(1))
+    return source, destination
+
+
+def best_time(differ, source, destination, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows, _ = differ(source, destination)
+        best = min(best, time.perf_counter() - start)
+    return best, len(rows)
+
+
+def main():
+    counts = int_args(1, [50, 500, 2000])
+    rng = random.Random(42)
+
+    table = Table(
+        ("columns", ">8"), ("by name ms", ">12.2f"), ("rows", ">6"), ("DeepDiff ms", ">13.1f"), ("rows", ">6"),
+        ("speedup", ">10")
+    )
+    table.header()
+    for count in counts:
+        source, destination = wide_table_pair(count, rng)
+        keyed, keyed_rows = best_time(diff_columns, source, destination)
+        deep, deep_rows = best_time(diff_objects, source, destination)
+        table.row(count, keyed * 1000, keyed_rows, deep * 1000, deep_rows, f"{deep / keyed:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
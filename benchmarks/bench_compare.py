@@ -0,0 +1,40 @@
+"""
+compare_metadata on a synthetic catalog: fingerprint fast path vs. diffing every object,
+and serial vs. process-pool comparison of the mismatched candidates.
+
+Run from the repository root:  python -m benchmarks.bench_compare [object_count] [drift_rate] [workers] [db_type]
+"""
+import os
+
+from benchmarks._common import arg, quiet_logger, synthetic_catalogs, timed
+from benchmarks.synthetic import count_objects
+from comparator import compare_metadata
+
+
+def run(source, destination, logger, **comparison):
+    return timed(compare_metadata, source, destination, {"comparison": comparison}, logger)
+
+
+def main():
+    object_count = arg(1, 50000)
+    drift_rate = arg(2, 0.01, float)
+    workers = arg(3, os.cpu_count())
+    db_type = arg(4, "sqlserver", str)
+
+    logger = quiet_logger("bench_compare")
+    catalogs = synthetic_catalogs(object_count, db_type, drift_rate=drift_rate)
+    source, destination = catalogs["source"], catalogs["destination"]
+    print(f"{db_type} objects: {count_objects(source)}, drift rate: {drift_rate}")
+
+    fast, fast_result = run(source, destination, logger, fingerprints=True)
+    print(f"fingerprint fast path:        {fast:8.2f}s")
+    parallel, parallel_result = run(source, destination, logger, fingerprints=True, workers=workers)
+    print(f"fast path + {workers:>2} processes:    {parallel:8.2f}s")
+    slow, slow_result = run(source, destination, logger, fingerprints=False)
+    print(f"diff on every object:         {slow:8.2f}s")
+    print(f"fast path speedup: {slow / fast:.1f}x, process pool speedup: {fast / parallel:.1f}x")
+    print(f"identical results: {fast_result == slow_result == parallel_result}")
+
+
+if __name__ == "__main__":
+    main()
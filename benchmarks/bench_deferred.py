@@ -0,0 +1,65 @@
+"""
+Definition text transferred by a live run with and without extraction.defer_definitions, against fake
+adapters replaying a synthetic pair with `drift_rate` of the objects changed. Deferred runs fetch a
+hash per view, routine and trigger first and the full text only where the hashes differ; both runs
+must produce the same diff report.
+
+Run from the repository root:  python -m benchmarks.bench_deferred [object_count] [drift_rate] [db_type]
+"""
+import json
+
+import main as app
+from benchmarks._common import arg, quiet_logger, synthetic_catalogs, timed
+from benchmarks.bench_end_to_end import bench_config
+from benchmarks.fake_adapter import FakeDBAdapter
+from comparator import DEFINITION_TYPES
+from metadata_model import DEFERRED_PREFIX, is_deferred, json_default
+
+
+class CountingAdapter(FakeDBAdapter):
+    """Counts the characters of definition text or hashes its extractors return."""
+    transferred = 0
+
+    def extract_object_type(self, cursor, schemas, obj_type, keys=None):
+        objects = super().extract_object_type(cursor, schemas, obj_type, keys)
+        if obj_type in DEFINITION_TYPES:
+            for value in objects.values():
+                text = value.get("definition") if isinstance(value, dict) else value
+                CountingAdapter.transferred += len(text or "") - (len(DEFERRED_PREFIX) if is_deferred(value) else 0)
+        return objects
+
+
+def run(config, catalogs, logger):
+    reports = []
+    app.get_db_adapter = lambda _db_type, adapter_config, adapter_logger: CountingAdapter(adapter_config, adapter_logger, catalogs)
+    app.write_reports = lambda diff_report, *args, **kwargs: reports.append(diff_report)
+    CountingAdapter.transferred = 0
+    seconds, _ = timed(app.run_command, app.parse_args([]), config, logger)
+    return seconds, CountingAdapter.transferred, reports[0]
+
+
+def main():
+    object_count = arg(1, 50000)
+    drift_rate = arg(2, 0.01, float)
+    db_type = arg(3, "sqlserver", str)
+
+    logger = quiet_logger("bench_deferred")
+    catalogs = synthetic_catalogs(object_count, db_type, drift_rate=drift_rate)
+    results = {}
+    for deferred in (False, True):
+        config = bench_config(db_type, "./reports")
+        config["extraction"]["defer_definitions"] = deferred
+        results[deferred] = run(config, catalogs, logger)
+
+    full_seconds, full_chars, full_report = results[False]
+    deferred_seconds, deferred_chars, deferred_report = results[True]
+    print(f"{object_count} objects, drift {drift_rate:.1%}, {db_type}")
+    print(f"  full definitions: {full_chars / 2**20:>8.1f} MB of definition text, {full_seconds:.2f}s")
+    print(f"  deferred:         {deferred_chars / 2**20:>8.1f} MB of hashes and text,  {deferred_seconds:.2f}s")
+    print(f"  transfer ratio:   {full_chars / max(deferred_chars, 1):>8.1f}x")
+    same = json.dumps(full_report, default=json_default) == json.dumps(deferred_report, default=json_default)
+    print(f"  identical reports: {same}")
+
+
+if __name__ == "__main__":
+    main()
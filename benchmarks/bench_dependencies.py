@@ -0,0 +1,42 @@
+"""
+Dependency propagation on a synthetic catalog: building the reverse dependency graph, finding the
+objects transitively affected by the drifted ones, and compare_metadata with and without the graphs.
+
+Run from the repository root:  python -m benchmarks.bench_dependencies [object_counts...]
+"""
+from benchmarks._common import Table, int_args, quiet_logger, synthetic_catalogs, timed
+from benchmarks.synthetic import generate_dependencies
+from comparator import compare_metadata
+from dependencies import DEPENDENCY_KEY, affected_objects, reverse_graph
+
+
+def main():
+    counts = int_args(1, [100000, 300000])
+    logger = quiet_logger("bench_dependencies")
+    config = {"comparison": {}}
+
+    table = Table(
+        ("objects", ">8"), ("edges", ">9"), ("reverse s", ">11.2f"), ("propagate s", ">13.3f"), ("affected", ">10"),
+        ("compare s", ">11.2f"), ("+graph s", ">10.2f")
+    )
+    table.header()
+    for count in counts:
+        catalogs = synthetic_catalogs(count, drift_rate=0.01)
+        source, destination = catalogs["source"], catalogs["destination"]
+        graph = generate_dependencies(source)
+        edges = sum(len(referenced) for referenced in graph.values())
+
+        plain, result = timed(compare_metadata, source, destination, config, logger)
+        changed = [key for diffs in result.values() for key in diffs["missing_in_dest"] + diffs["extra_in_dest"]]
+        changed += [mismatch["object"] for diffs in result.values() for mismatch in diffs["mismatched"]]
+        reverse_time, dependents = timed(reverse_graph, graph, graph)
+        propagate_time, affected = timed(affected_objects, changed, dependents)
+
+        source[DEPENDENCY_KEY] = graph
+        destination[DEPENDENCY_KEY] = graph
+        with_graph, _ = timed(compare_metadata, source, destination, config, logger)
+        table.row(count, edges, reverse_time, propagate_time, len(affected), plain, with_graph)
+
+
+if __name__ == "__main__":
+    main()
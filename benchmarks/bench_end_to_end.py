@@ -0,0 +1,79 @@
+"""
+End-to-end run of main (extraction, comparison, HTML and JSON Lines reports) against fake adapters
+replaying synthetic catalogs in each adapter's metadata shapes, with a per-phase time breakdown.
+
+Run from the repository root:  python -m benchmarks.bench_end_to_end [db_type|all] [object_counts...]
+"""
+import os
+import tempfile
+
+import main as app
+import profiler
+from benchmarks._common import DB_TYPES, Table, arg, int_args, quiet_logger, synthetic_catalogs, timed
+from benchmarks.fake_adapter import FakeDBAdapter
+from benchmarks.synthetic import DEFAULT_SCHEMAS, count_objects
+from report_generator import configure_templates
+
+OBJECT_TYPES = ["tables", "views", "constraints", "indexes", "stored_procedures", "functions", "triggers"]
+
+
+def bench_config(db_type, report_dir):
+    schemas = list(DEFAULT_SCHEMAS[db_type])
+    return {
+        "active_db": db_type,
+        db_type: {
+            "source": {"server": "bench", "database": "source", "schemas": schemas},
+            "destination": {"server": "bench", "database": "destination", "schemas": schemas}
+        },
+        "compare_objects": {obj_type: True for obj_type in OBJECT_TYPES},
+        "extraction": {"concurrent": True},
+        "comparison": {"fingerprints": True},
+        "output": {
+            "formats": ["html", "jsonl"],
+            "html_report": os.path.join(report_dir, "schema_diff_report.html"),
+            "jsonl_report": os.path.join(report_dir, "schema_diff_report.jsonl")
+        }
+    }
+
+
+def run(db_type, object_count, logger, report_dir):
+    catalogs = synthetic_catalogs(object_count, db_type)
+    config = bench_config(db_type, report_dir)
+    app.get_db_adapter = lambda _db_type, adapter_config, adapter_logger: FakeDBAdapter(adapter_config, adapter_logger, catalogs)
+
+    profile = profiler.start("bench")
+    try:
+        total, _ = timed(app.run_command, app.parse_args([]), config, logger)
+    finally:
+        profiler.stop()
+
+    phases = profile.to_dict()["phases"]
+    compare = sum(entry.get("match_seconds", 0) + entry.get("diff_seconds", 0) for entry in profile.comparison.values())
+    compare += sum(entry["seconds"] for name, entry in phases.items() if name.startswith("compare."))
+    reports = sum(entry["seconds"] for name, entry in phases.items() if name.startswith("report."))
+    return count_objects(catalogs["source"]), total, compare, reports
+
+
+def main():
+    db_type = arg(1, "all", str)
+    db_types = DB_TYPES if db_type == "all" else (db_type,)
+    counts = int_args(2, [1000, 10000, 100000])
+
+    logger = quiet_logger("bench_end_to_end")
+    configure_templates()
+
+    table = Table(
+        ("db_type", "<12"), ("objects", ">9"), ("total s", ">9.2f"), ("extract s", ">10.2f"), ("compare s", ">10.2f"),
+        ("reports s", ">10.2f")
+    )
+    table.header()
+    with tempfile.TemporaryDirectory() as report_dir:
+        for db_type in db_types:
+            for count in counts:
+                objects, total, compare, reports = run(db_type, count, logger, report_dir)
+                # Extraction is replayed from memory, so "extract" is mostly connection and threading overhead
+                table.row(db_type, objects, total, total - compare - reports, compare, reports)
+
+
+if __name__ == "__main__":
+    main()
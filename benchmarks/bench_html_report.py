@@ -0,0 +1,59 @@
+"""
+HTML report rendering: template.render() into one string vs. streaming template chunks to the file,
+peak Python memory (tracemalloc) and wall time against the number of mismatched rows, plus the size
+of the index page a lazy report (output.html_mode = "lazy") has to open instead.
+
+Run from the repository root:  python -m benchmarks.bench_html_report [rows_per_object] [mismatched_counts...]
+"""
+import os
+import tempfile
+import tracemalloc
+
+from benchmarks._common import Table, arg, int_args, quiet_logger, timed
+from benchmarks.synthetic import generate_diff_report
+from report_generator import generate_html_report, generate_lazy_html_report
+
+INFO = {"server": "bench", "database": "bench"}
+
+
+def render(diff_report, path, logger, streaming):
+    elapsed, _ = timed(generate_html_report, diff_report, path, logger, INFO, INFO, streaming=streaming)
+
+    # Separate traced run: tracemalloc slows allocation-heavy code, so it would skew the timing
+    tracemalloc.start()
+    generate_html_report(diff_report, path, logger, INFO, INFO, streaming=streaming)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    rows_per_object = arg(1, 10)
+    counts = int_args(2, [1000, 5000, 20000])
+
+    logger = quiet_logger("bench_html_report")
+
+    table = Table(
+        ("mismatched rows", ">16"), ("size MB", ">8.1f"), ("render s", ">9.2f"), ("render MB", ">10.1f"),
+        ("stream s", ">9.2f"), ("stream MB", ">10.1f"), ("lazy s", ">7.2f"), ("index KB", ">9.1f"),
+        separator=" "
+    )
+    table.header()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "report.html")
+        for count in counts:
+            diff_report = generate_diff_report(count, rows_per_object)
+            render_time, render_peak = render(diff_report, path, logger, streaming=False)
+            stream_time, stream_peak = render(diff_report, path, logger, streaming=True)
+            size = os.path.getsize(path)
+
+            lazy_path = os.path.join(tmp, "lazy.html")
+            lazy_time, _ = timed(generate_lazy_html_report, diff_report, lazy_path, logger, INFO, INFO)
+            table.row(
+                count * rows_per_object, size / 2**20, render_time, render_peak / 2**20,
+                stream_time, stream_peak / 2**20, lazy_time, os.path.getsize(lazy_path) / 2**10
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Memory held by extracted columns, index columns and constraint columns: plain nested dicts (how the
+adapters used to build them) vs. metadata records with interned strings (metadata_model.py).
+
+Both are decoded from the same JSON text, so every string is a fresh object, as it is when it comes
+from a database driver. Run from the repository root:  python -m benchmarks.bench_memory [object_counts...]
+"""
+import gc
+import json
+import tracemalloc
+
+from benchmarks._common import DB_TYPES, Table, int_args, timed
+from benchmarks.synthetic import generate_catalog
+from metadata_model import compact_metadata
+
+COLUMN_TYPES = ("tables", "indexes", "constraints")
+
+
+def retained(build):
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size
+
+
+def count_columns(metadata):
+    total = 0
+    for obj_type, objects in metadata.items():
+        groups = objects.values() if obj_type == "constraints" else [objects]
+        total += sum(len(entries) for group in groups for entries in group.values())
+    return total
+
+
+def main():
+    counts = int_args(1, [10000, 100000])
+
+    table = Table(
+        ("db_type", "<12"), ("objects", ">9"), ("columns", ">10"), ("dicts MB", ">10.1f"), ("records MB", ">11.1f"),
+        ("ratio", ">7.1f"), ("compact s", ">10.2f")
+    )
+    table.header()
+    for db_type in DB_TYPES:
+        for count in counts:
+            catalog = generate_catalog(count, db_type=db_type, compact=False)
+            text = json.dumps({obj_type: catalog[obj_type] for obj_type in COLUMN_TYPES})
+            del catalog
+
+            dicts, dicts_size = retained(lambda: json.loads(text))
+            columns = count_columns(dicts)
+            # Timed separately: tracemalloc slows allocation-heavy code, so it would skew the timing
+            elapsed, _ = timed(compact_metadata, dicts)
+            del dicts
+            records, records_size = retained(lambda: compact_metadata(json.loads(text)))
+            del records
+            table.row(db_type, count, columns, dicts_size / 2**20, records_size / 2**20, dicts_size / records_size, elapsed)
+
+
+if __name__ == "__main__":
+    main()
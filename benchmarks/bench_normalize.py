@@ -0,0 +1,47 @@
+"""
+Definition normalization on a routine corpus where every destination definition is reformatted
+(CRLF, brackets, comment banner, indentation) and a few also really differ: normalization cost, cold and
+memoized, and what it saves in comparison time and report size.
+
+Run from the repository root:  python -m benchmarks.bench_normalize [routine_count] [drift_rate]
+"""
+import json
+
+from benchmarks._common import arg, quiet_logger, timed
+from benchmarks.synthetic import generate_routine_corpus
+from comparator import compare_metadata, normalize_definitions
+from utils.sql_normalizer import clear_cache
+
+NORMALIZATION = {"active_db": "sqlserver", "normalization": {"enabled": True}}
+
+
+def run(source, destination, logger, config):
+    elapsed, result = timed(compare_metadata, source, destination, config, logger)
+    result = result["stored_procedures"]
+    return elapsed, len(result["mismatched"]), len(json.dumps(result, default=str))
+
+
+def main():
+    routine_count = arg(1, 20000)
+    drift_rate = arg(2, 0.01, float)
+
+    logger = quiet_logger("bench_normalize")
+
+    source, destination = generate_routine_corpus(routine_count, drift_rate)
+    size = sum(len(text) for text in destination["stored_procedures"].values())
+    print(f"routines: {routine_count}, destination definitions: {size / 2**20:.1f} MB, drift rate: {drift_rate}")
+
+    clear_cache()
+    cold, _ = timed(normalize_definitions, destination, NORMALIZATION)
+    warm, _ = timed(normalize_definitions, destination, NORMALIZATION)
+    print(f"normalize, first pass:     {cold:7.2f}s ({size / 2**20 / cold:.1f} MB/s)")
+    print(f"normalize, memoized:       {warm:7.2f}s")
+
+    for label, config in (("raw definitions", {}), ("normalized", NORMALIZATION)):
+        clear_cache()
+        elapsed, mismatched, report_bytes = run(source, destination, logger, config)
+        print(f"compare, {label + ':':<17} {elapsed:7.2f}s, {mismatched:6} mismatched, report {report_bytes / 2**20:7.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Rename detection on a synthetic catalog: MinHash/LSH candidate pairing (renames.find_renames) vs.
+scoring every missing x extra pair. Half of the missing objects were renamed (and some of those
+lightly edited), the rest were dropped; the destination also has unrelated new objects.
+
+Run from the repository root:  python -m benchmarks.bench_renames [missing_counts...]
+"""
+import random
+
+from benchmarks._common import Table, int_args, timed
+from benchmarks.synthetic import generate_catalog
+from renames import find_renames, jaccard, object_tokens
+
+OBJ_TYPES = ("tables", "views", "stored_procedures")
+
+
+def rename(obj_type, key, obj, rng):
+    new_key = f"{key}_renamed" if rng.random() < 0.8 else key.replace("dbo.", "archive.", 1)
+    if obj_type == "tables":
+        columns = list(obj)
+        if rng.random() < 0.3:
+            columns[rng.randrange(len(columns))] = {"column": "col_changed", "data_type": "int", "max_length": 4}
+        return new_key, columns
+    definition = obj.replace(key, new_key)
+    if rng.random() < 0.3:
+        definition = definition.replace("WHERE id", "WHERE key_id", 1)
+    return new_key, definition
+
+
+def build_case(missing_count, seed=42):
+    rng = random.Random(seed)
+    # generate_catalog spreads objects across types; scale it so each type has enough to draw from
+    catalog = generate_catalog(missing_count * 12, seed=seed, compact=False)
+    unrelated = generate_catalog(missing_count * 12, schemas=["new"], seed=seed + 1, compact=False)
+    cases = {}
+    for obj_type in OBJ_TYPES:
+        keys = rng.sample(sorted(catalog[obj_type]), missing_count)
+        missing = {key: catalog[obj_type][key] for key in keys}
+        extra, expected = {}, {}
+        for key in keys[:missing_count // 2]:
+            new_key, obj = rename(obj_type, key, missing[key], rng)
+            extra[new_key] = obj
+            expected[key] = new_key
+        for key in rng.sample(sorted(unrelated[obj_type]), missing_count // 2):
+            extra[key] = unrelated[obj_type][key]
+        cases[obj_type] = (missing, extra, expected)
+    return cases
+
+
+def all_pairs(missing, extra, threshold=0.8):
+    extra_tokens = {key: object_tokens(obj) for key, obj in extra.items()}
+    scored = []
+    for key, obj in missing.items():
+        tokens = object_tokens(obj)
+        for candidate, candidate_tokens in extra_tokens.items():
+            similarity = jaccard(tokens, candidate_tokens)
+            if similarity >= threshold:
+                scored.append((-similarity, key, candidate))
+    pairs, used_missing, used_extra = [], set(), set()
+    for negative_similarity, key, candidate in sorted(scored):
+        if key not in used_missing and candidate not in used_extra:
+            pairs.append((key, candidate, -negative_similarity))
+            used_missing.add(key)
+            used_extra.add(candidate)
+    return pairs
+
+
+def score(pairs, expected):
+    found = sum(1 for src, dst, _ in pairs if expected.get(src) == dst)
+    return found / len(expected), len(pairs) - found
+
+
+def main():
+    counts = int_args(1, [1000, 5000])
+
+    table = Table(
+        ("type", "<19"), ("missing", ">8"), ("LSH ms", ">10.0f"), ("recall", ">8.1%"), ("wrong", ">7"),
+        ("all pairs ms", ">14.0f"), ("recall", ">8.1%"), ("wrong", ">7")
+    )
+    table.header()
+    for count in counts:
+        for obj_type, (missing, extra, expected) in build_case(count).items():
+            lsh, lsh_pairs = timed(find_renames, missing, extra)
+            exact, exact_pairs = timed(all_pairs, missing, extra)
+            lsh_recall, lsh_wrong = score(lsh_pairs, expected)
+            exact_recall, exact_wrong = score(exact_pairs, expected)
+            table.row(obj_type, count, lsh * 1000, lsh_recall, lsh_wrong, exact * 1000, exact_recall, exact_wrong)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Counts catalog round trips per adapter for a growing number of schemas.
+
+Uses a recording connection that returns empty result sets, so no database server is needed. Driver
+modules that cannot be imported (not installed, or e.g. pyodbc without libodbc) are replaced by empty
+stand-ins: the adapters only use them to open connections, which the benchmark never does.
+Run from the repository root:  python -m benchmarks.bench_round_trips
+"""
+import importlib
+import sys
+import types
+
+from benchmarks._common import DB_TYPES, Table, quiet_logger, timed
+from db_factory import get_db_adapter
+
+DRIVER_MODULES = ("pyodbc", "mysql.connector", "psycopg2")
+OBJECT_TYPES = ["tables", "views", "constraints", "indexes", "stored_procedures", "functions", "triggers"]
+
+
+class RecordingCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query, *params):
+        self.conn.round_trips += 1
+
+    def fetchmany(self, size):
+        return []
+
+    def close(self):
+        pass
+
+
+class RecordingConnection:
+    def __init__(self):
+        self.round_trips = 0
+
+    def cursor(self, *args, **kwargs):
+        return RecordingCursor(self)
+
+    def close(self):
+        pass
+
+
+def stub_missing_drivers():
+    for name in DRIVER_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            parent = None
+            for part in name.split("."):
+                qualified = f"{parent.__name__}.{part}" if parent else part
+                module = sys.modules.get(qualified) or types.ModuleType(qualified)
+                sys.modules[qualified] = module
+                if parent is not None:
+                    setattr(parent, part, module)
+                parent = module
+
+
+def count_round_trips(db_type, schemas, logger):
+    config = {
+        "schemas_to_compare": schemas,
+        "compare_objects": {obj_type: True for obj_type in OBJECT_TYPES},
+        "extraction": {"max_workers": 1}
+    }
+    adapter = get_db_adapter(db_type, config, logger)
+    adapter.conn = RecordingConnection()
+    adapter.extract_metadata()
+    return adapter.conn.round_trips
+
+
+def main():
+    logger = quiet_logger("bench_round_trips")
+    stub_missing_drivers()
+
+    table = Table(("db_type", "<12"), ("schemas", ">8"), ("round_trips", ">13"), ("seconds", ">10.4f"))
+    table.header()
+    for db_type in DB_TYPES:
+        for schema_count in (1, 10, 40, 100):
+            schemas = [f"schema_{i}" for i in range(schema_count)]
+            seconds, round_trips = timed(count_round_trips, db_type, schemas, logger)
+            table.row(db_type, schema_count, round_trips, seconds)
+
+
+if __name__ == "__main__":
+    main()
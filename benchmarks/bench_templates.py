@@ -0,0 +1,64 @@
+"""
+Template compilation cost when generating many small reports: a fresh Jinja environment per report
+(the old behaviour) vs. the shared environment, and compiling from source vs. the on-disk bytecode cache.
+
+Run from the repository root:  python -m benchmarks.bench_templates [report_count]
+"""
+import os
+import tempfile
+import time
+
+from jinja2 import Environment, FileSystemLoader
+
+import report_generator
+from benchmarks._common import arg, quiet_logger, timed
+from benchmarks.synthetic import generate_diff_report
+from report_generator import TEMPLATE_DIR, configure_templates, generate_html_reports
+
+INFO = {"server": "bench", "database": "bench"}
+
+
+def fresh_environment_per_report(reports):
+    for diff_report, path, src_info, dst_info in reports:
+        template = Environment(loader=FileSystemLoader(TEMPLATE_DIR)).get_template("report_html_template.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(template.render(diff=diff_report, source=src_info, destination=dst_info, timestamp=""))
+
+
+def compile_time(bytecode_cache_dir, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        # A new environment has an empty in-memory cache, like a new process would
+        configure_templates(bytecode_cache_dir)
+        for name in os.listdir(TEMPLATE_DIR):
+            report_generator.get_template(name)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    report_count = arg(1, 500)
+
+    logger = quiet_logger("bench_templates")
+
+    diff_report = generate_diff_report(20, 5)
+    with tempfile.TemporaryDirectory() as tmp:
+        reports = [(diff_report, os.path.join(tmp, f"report_{i}.html"), INFO, INFO) for i in range(report_count)]
+
+        fresh, _ = timed(fresh_environment_per_report, reports)
+
+        configure_templates()
+        shared, _ = timed(generate_html_reports, reports, logger, streaming=False)
+
+        print(f"{report_count} reports, fresh environment each: {fresh:6.2f}s")
+        print(f"{report_count} reports, shared environment:     {shared:6.2f}s ({fresh / shared:.1f}x)")
+
+        cache_dir = os.path.join(tmp, "bytecode")
+        source = compile_time(None)
+        compile_time(cache_dir, repeat=1)  # populate the bytecode cache
+        cached = compile_time(cache_dir)
+        print(f"load all templates, compiled from source: {source * 1000:6.1f}ms")
+        print(f"load all templates, from bytecode cache:  {cached * 1000:6.1f}ms ({source / cached:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
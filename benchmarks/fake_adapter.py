@@ -0,0 +1,89 @@
+"""
+An in-memory BaseDBAdapter that replays synthetic catalogs, so extraction, comparison and reporting
+can be benchmarked end to end without a database server or driver.
+"""
+import hashlib
+import time
+
+from comparator import DEFINITION_TYPES
+from db_adapters.base_db_adapter import BaseDBAdapter
+from metadata_model import deferred_definition
+
+# compare_objects flags that enable a metadata key other than their own (MySQL/PostgreSQL routines)
+OBJECT_TYPE_FLAGS = {"routines": ("stored_procedures", "functions")}
+
+
+def _hashed(value):
+    # What a deferred catalog query returns: a hash of the definition in place of its text
+    text = value.get("definition") if isinstance(value, dict) else value
+    placeholder = deferred_definition(hashlib.sha256(text.encode("utf-8")).hexdigest() if text is not None else None)
+    return {**value, "definition": placeholder} if isinstance(value, dict) else placeholder
+
+
+class NullCursor:
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def cursor(self):
+        return NullCursor()
+
+    def close(self):
+        pass
+
+
+class FakeDBAdapter(BaseDBAdapter):
+    """
+    Replays catalogs[dbconstr["database"]] as the extracted metadata, one extractor per object type.
+    Each extractor sleeps `latency` seconds first, standing in for the catalog query round trip.
+    """
+    # Hashes are computed in Python (see _hashed); set so that deferred extraction is enabled
+    hash_expression = "sha256({})"
+
+    def __init__(self, config, logger, catalogs, latency=0.0):
+        super().__init__(config, logger)
+        self.catalogs = catalogs
+        self.latency = latency
+
+    def connect(self, dbconstr):
+        self.dbconstr = dbconstr
+        if self.conn is None:
+            self.conn = self.open_connection(dbconstr)
+        return self.conn
+
+    def open_connection(self, dbconstr):
+        if dbconstr["database"] not in self.catalogs:
+            raise ConnectionError(f"No synthetic catalog for database {dbconstr['database']}")
+        return FakeConnection()
+
+    def extraction_tasks(self, schemas, object_types):
+        catalog = self.catalogs[self.dbconstr["database"]]
+        return [
+            (obj_type, self.extract_object_type, (obj_type,))
+            for obj_type in catalog
+            if any(object_types.get(flag) for flag in OBJECT_TYPE_FLAGS.get(obj_type, (obj_type,)))
+        ]
+
+    def extract_object_type(self, cursor, schemas, obj_type, keys=None):
+        if self.latency:
+            time.sleep(self.latency)
+        objects = self.catalogs[self.dbconstr["database"]][obj_type]
+        if keys is not None:
+            return {key: objects[key] for key in keys if key in objects}
+        if self.defer_definitions and obj_type in DEFINITION_TYPES:
+            return {key: _hashed(value) for key, value in objects.items()}
+        return objects
+
+    def extract_tables(self, cursor, schemas):
+        return self.extract_object_type(cursor, schemas, "tables")
+
+    def extract_views(self, cursor, schemas):
+        return self.extract_object_type(cursor, schemas, "views")
+
+    def extract_routines(self, cursor, schemas, routine_type):
+        return self.extract_object_type(cursor, schemas, routine_type)
+
+    def close(self):
+        self.close_pool()
+        self.conn = None
@@ -0,0 +1,305 @@
+"""
+Synthetic catalogs in the metadata shapes returned by the SQL Server, MySQL and PostgreSQL adapters.
+"""
+import random
+
+from metadata_model import compact_metadata
+
+DATA_TYPES = [("int", 4), ("bigint", 8), ("varchar", 255), ("nvarchar", 510), ("datetime2", 8), ("decimal", 9), ("bit", 1)]
+MYSQL_DATA_TYPES = [("int", None), ("bigint", None), ("varchar", 255), ("text", 65535), ("datetime", None), ("decimal", None), ("tinyint", None)]
+POSTGRESQL_DATA_TYPES = [
+    ("integer", None), ("bigint", None), ("character varying", 255), ("text", None),
+    ("timestamp without time zone", None), ("numeric", None), ("boolean", None)
+]
+
+# Share of objects per type in a generated catalog, by adapter. "constraints" counts tables with constraints.
+OBJECT_MIXES = {
+    "sqlserver": {
+        "tables": 0.30,
+        "views": 0.10,
+        "stored_procedures": 0.20,
+        "functions": 0.05,
+        "constraints": 0.10,
+        "indexes": 0.15,
+        "triggers": 0.10,
+    },
+    "mysql": {
+        "tables": 0.35,
+        "views": 0.10,
+        "routines": 0.20,
+        "constraints": 0.10,
+        "indexes": 0.15,
+        "triggers": 0.10,
+    },
+    "postgresql": {
+        "tables": 0.35,
+        "views": 0.10,
+        "routines": 0.20,
+        "constraints": 0.10,
+        "indexes": 0.15,
+        "triggers": 0.10,
+    },
+}
+OBJECT_MIX = OBJECT_MIXES["sqlserver"]
+
+DEFAULT_SCHEMAS = {"sqlserver": ("dbo",), "mysql": ("app",), "postgresql": ("public",)}
+
+
+def _definition(kind, name, rng, lines):
+    body = "\n".join(f"    SELECT col_{i} FROM dbo.table_{rng.randrange(1000)} WHERE id = @p{i};" for i in range(lines))
+    return f"CREATE {kind} {name}\nAS\nBEGIN\n{body}\nEND\n"
+
+
+def _columns(rng, count, db_type="sqlserver"):
+    columns = []
+    if db_type == "sqlserver":
+        for i in range(count):
+            data_type, max_length = rng.choice(DATA_TYPES)
+            columns.append({"column": f"col_{i}", "data_type": data_type, "max_length": max_length})
+        return columns
+    data_types = MYSQL_DATA_TYPES if db_type == "mysql" else POSTGRESQL_DATA_TYPES
+    for i in range(count):
+        data_type, max_length = rng.choice(data_types)
+        columns.append({
+            "column": f"col_{i}",
+            "data_type": data_type,
+            "nullable": "NO" if i == 0 else rng.choice(("YES", "NO")),
+            "max_length": max_length
+        })
+    return columns
+
+
+def _constraints(name, rng, db_type):
+    """{kind: entries} of the table `name`, in the adapter's per-kind entry shape."""
+    table = name.rsplit(".", 1)[-1]
+    kinds = {"primary_keys": ["col_0"]}
+    if rng.random() < 0.5:
+        kinds["foreign_keys"] = [f"col_{rng.randint(1, 3)}"]
+    if rng.random() < 0.2:
+        kinds["unique_constraints"] = [f"col_{rng.randint(1, 3)}"]
+
+    prefixes = {"primary_keys": "PK", "foreign_keys": "FK", "unique_constraints": "UQ"}
+    result = {}
+    for kind, columns in kinds.items():
+        if db_type == "sqlserver":
+            result[kind] = [{"constraint_name": f"{prefixes[kind]}_{table}_{c}", "column": c} for c in columns]
+        elif db_type == "mysql":
+            result[kind] = ["PRIMARY" if kind == "primary_keys" else f"{prefixes[kind].lower()}_{table}_{c}" for c in columns]
+        else:
+            definitions = {
+                "primary_keys": "PRIMARY KEY ({})",
+                "foreign_keys": f"FOREIGN KEY ({{}}) REFERENCES public.tables_{rng.randrange(1000)}(col_0)",
+                "unique_constraints": "UNIQUE ({})"
+            }
+            result[kind] = [{"name": f"{table}_{c}_{prefixes[kind].lower()}", "definition": definitions[kind].format(c)} for c in columns]
+    return result
+
+
+def _make_object(obj_type, name, rng, db_type="sqlserver"):
+    if obj_type == "tables":
+        return _columns(rng, rng.randint(3, 30), db_type)
+    if obj_type == "views":
+        return _definition("VIEW", name, rng, rng.randint(2, 10))
+    if obj_type in ("stored_procedures", "functions"):
+        return _definition("PROCEDURE" if obj_type == "stored_procedures" else "FUNCTION", name, rng, rng.randint(5, 60))
+    if obj_type == "routines":
+        kind = "PROCEDURE" if rng.random() < 0.8 else "FUNCTION"
+        return {"type": kind, "definition": _definition(kind, name, rng, rng.randint(5, 60))}
+    if obj_type == "constraints":
+        return _constraints(name, rng, db_type)
+    if obj_type == "indexes":
+        columns = [f"col_{i}" for i in range(rng.randint(1, 4))]
+        if db_type == "sqlserver":
+            return [{"column": c, "index_type": "NONCLUSTERED", "included": False} for c in columns]
+        if db_type == "mysql":
+            return [{"column": c, "non_unique": True} for c in columns]
+        return columns
+    if obj_type == "triggers":
+        definition = _definition("TRIGGER", name, rng, rng.randint(2, 15))
+        return {"definition": definition, "disabled": False} if db_type == "sqlserver" else {"definition": definition}
+    raise ValueError(f"Unknown object type: {obj_type}")
+
+
+def _drift(obj_type, value, rng):
+    if obj_type == "tables":
+        changed = [dict(col) for col in value]
+        changed[rng.randrange(len(changed))]["data_type"] = "nvarchar"
+        return changed
+    if obj_type in ("views", "stored_procedures", "functions"):
+        return value.replace("WHERE", "WHERE 1 = 1 AND", 1)
+    if obj_type == "routines":
+        return {**value, "definition": value["definition"].replace("WHERE", "WHERE 1 = 1 AND", 1)}
+    if obj_type == "constraints":
+        # One constraint kind of the table, e.g. a primary key on another column
+        return [_drift_entry(entry) for entry in value]
+    if obj_type == "indexes":
+        extra = dict(value[0], column="col_extra") if isinstance(value[0], dict) else "col_extra"
+        return value + [extra]
+    if obj_type == "triggers":
+        if "disabled" in value:
+            return {**value, "disabled": not value["disabled"]}
+        return {**value, "definition": value["definition"].replace("BEGIN", "BEGIN\n    SET NOCOUNT ON;", 1)}
+    return value
+
+
+def _drift_entry(entry):
+    if isinstance(entry, str):
+        return entry + "_v2"
+    if "column" in entry:
+        return {**entry, "column": "col_extra"}
+    return {**entry, "definition": entry["definition"].replace("col_", "col_extra_", 1)}
+
+
+def generate_catalog(object_count, schemas=None, seed=42, db_type="sqlserver", compact=True):
+    """
+    Return a catalog of about `object_count` objects as `db_type`'s adapter extracts it; the
+    constraints of a table are nested under their kind, e.g. constraints -> primary_keys -> table.
+    With compact=False, columns are plain dicts instead of metadata records.
+    """
+    rng = random.Random(seed)
+    schemas = schemas or DEFAULT_SCHEMAS[db_type]
+    metadata = {}
+    for obj_type, share in OBJECT_MIXES[db_type].items():
+        objects = {}
+        for i in range(max(1, int(object_count * share))):
+            schema = schemas[i % len(schemas)]
+            name = f"{schema}.{obj_type}_{i}"
+            if obj_type in ("indexes", "triggers"):
+                name = f"{schema}.table_{i}.{obj_type[:-1]}_{i}"
+            elif obj_type == "constraints":
+                name = f"{schema}.tables_{i}"
+            objects[name] = _make_object(obj_type, name, rng, db_type)
+        if obj_type == "constraints":
+            objects = _nest_constraints(objects)
+        metadata[obj_type] = objects
+    return compact_metadata(metadata) if compact else metadata
+
+
+def _nest_constraints(by_table):
+    nested = {"primary_keys": {}, "foreign_keys": {}, "unique_constraints": {}}
+    for table, kinds in by_table.items():
+        for kind, entries in kinds.items():
+            nested[kind][table] = entries
+    return nested
+
+
+def count_objects(metadata):
+    """Number of objects in a catalog, counting each table of a nested constraint kind."""
+    return sum(
+        sum(len(tables) for tables in objects.values()) if obj_type == "constraints" else len(objects)
+        for obj_type, objects in metadata.items()
+    )
+
+
+def _mutate(obj_type, objects, rng, drift_rate, missing_rate, extra_rate, db_type):
+    mutated = {}
+    for name, value in objects.items():
+        roll = rng.random()
+        if roll < missing_rate:
+            continue
+        if roll < missing_rate + drift_rate:
+            value = _drift(obj_type, value, rng)
+        mutated[name] = value
+    for i in range(int(len(objects) * extra_rate)):
+        name = f"{next(iter(objects), 'dbo.x').split('.', 1)[0]}.extra_{obj_type}_{i}"
+        extra = _make_object(obj_type, name, rng, db_type)
+        mutated[name] = next(iter(extra.values())) if obj_type == "constraints" else extra
+    return mutated
+
+
+def generate_pair(object_count, drift_rate=0.01, missing_rate=0.001, extra_rate=0.001, seed=42, db_type="sqlserver"):
+    """
+    Return (source, destination) catalogs where `drift_rate` of the destination objects differ,
+    `missing_rate` are dropped and `extra_rate` extra objects are added. Objects from 1k up to
+    about 1M are practical; the catalogs of a 1M pair need a few GB of memory.
+    """
+    rng = random.Random(seed + 1)
+    source = generate_catalog(object_count, seed=seed, db_type=db_type)
+    # Generated again rather than copied: objects read from two servers never share references,
+    # and DeepDiff short-circuits on identical objects
+    mirror = generate_catalog(object_count, seed=seed, db_type=db_type)
+    destination = {}
+    for obj_type, objects in mirror.items():
+        if obj_type == "constraints":
+            # Drift applies per table within each constraint kind
+            destination[obj_type] = {
+                kind: _mutate(obj_type, tables, rng, drift_rate, missing_rate, extra_rate, db_type)
+                for kind, tables in objects.items()
+            }
+        else:
+            destination[obj_type] = _mutate(obj_type, objects, rng, drift_rate, missing_rate, extra_rate, db_type)
+    # Drifted and extra objects are built as dicts
+    return source, compact_metadata(destination)
+
+def generate_dependencies(catalog, references=4, seed=42):
+    """
+    Return a dependency graph ({referencing_key: [referenced_key, ...]}) for a generated catalog:
+    every view and routine references `references` tables or views (views only earlier views, so
+    chains form), every trigger two tables.
+    """
+    rng = random.Random(seed)
+    tables = list(catalog.get("tables", {}))
+    graph = {}
+    referable = list(tables)
+    for key in catalog.get("views", {}):
+        graph[key] = rng.sample(referable, min(references, len(referable)))
+        referable.append(key)
+    for obj_type in ("stored_procedures", "functions", "routines"):
+        for key in catalog.get(obj_type, {}):
+            graph[key] = rng.sample(referable, min(references, len(referable)))
+    for key in catalog.get("triggers", {}):
+        graph[key] = rng.sample(tables, min(2, len(tables)))
+    return graph
+
+def generate_diff_report(mismatched_count, rows_per_object=10, seed=42):
+    """
+    Return a compare_metadata() result with `mismatched_count` mismatched tables of
+    `rows_per_object` column differences each, for report rendering benchmarks.
+    """
+    rng = random.Random(seed)
+    mismatched = []
+    for i in range(mismatched_count):
+        diffs = []
+        for c in range(rows_per_object):
+            src_type, src_length = rng.choice(DATA_TYPES)
+            dst_type, dst_length = rng.choice(DATA_TYPES)
+            diffs.append({
+                "attribute": f"root[{c}]",
+                "source": {"column": f"col_{c}", "data_type": src_type, "max_length": src_length},
+                "destination": {"column": f"col_{c}", "data_type": dst_type, "max_length": dst_length}
+            })
+        mismatched.append({"object": f"dbo.table_{i}", "diffs": diffs})
+    return {
+        "tables": {
+            "missing_in_dest": [f"dbo.missing_{i}" for i in range(mismatched_count // 10)],
+            "extra_in_dest": [f"dbo.extra_{i}" for i in range(mismatched_count // 10)],
+            "mismatched": mismatched
+        }
+    }
+
+
+def reformat_definition(text, rng):
+    """The same definition as scripted by another tool: CRLF, bracket quoting, comment banner, re-indentation."""
+    lines = [
+        " " * rng.choice((0, 2, 4, 8)) + line.strip().replace("dbo.", "[dbo].") + " " * rng.randrange(3)
+        for line in text.splitlines()
+    ]
+    banner = f"/****** Object: scripted {rng.randrange(10**6)} ******/\r\n-- generated\r\n"
+    return banner + "\r\n".join(lines) + "\r\n\r\n"
+
+
+def generate_routine_corpus(routine_count, drift_rate=0.01, seed=42):
+    """
+    Return (source, destination) {"stored_procedures": ...} catalogs where every destination definition is
+    reformatted with reformat_definition() and `drift_rate` of them also differ in content.
+    """
+    rng = random.Random(seed)
+    source, destination = {}, {}
+    for i in range(routine_count):
+        name = f"dbo.usp_{i}"
+        definition = _definition("PROCEDURE", name, rng, rng.randint(5, 200))
+        source[name] = definition
+        if rng.random() < drift_rate:
+            definition = _drift("stored_procedures", definition, rng)
+        destination[name] = reformat_definition(definition, rng)
+    return {"stored_procedures": source}, {"stored_procedures": destination}
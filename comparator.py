@@ -1,8 +1,237 @@
+from bisect import bisect_left
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
 from deepdiff import DeepDiff
+from deepdiff.helper import notpresent
+from dependencies import DEPENDENCY_KEY, affected_objects, reverse_graph
+from renames import find_renames, rename_entry
+from utils.hashlib import fingerprint
+from utils.sql_normalizer import normalize_sql
+import difflib
+import time
+import profiler
 
-def compare_metadata(source_meta, dest_meta, config, logger):
+# Object types whose values are module definitions (a string, or a dict with a "definition" key)
+DEFINITION_TYPES = ("views", "stored_procedures", "functions", "triggers", "routines")
+# Object types whose values are column lists, compared column by column by name
+COLUMN_TYPES = ("tables",)
+
+def definition_hunks(src_text, dst_text, context=3):
+    """Unified diff hunks between two definitions, with `context` unchanged lines around each change."""
+    lines = difflib.unified_diff(
+        (src_text or "").splitlines(), (dst_text or "").splitlines(),
+        fromfile="source", tofile="destination", n=context, lineterm=""
+    )
+    # Drop the ---/+++ header; the report already says which side is which
+    return "\n".join(islice(lines, 2, None))
+
+def diff_definition(src_obj, dst_obj, context):
+    """diff_objects() for definition types: changed definitions become one row of unified diff hunks."""
+    if isinstance(src_obj, str) and isinstance(dst_obj, str):
+        hunks = definition_hunks(src_obj, dst_obj, context)
+        return ([{"attribute": "root", "diff": hunks}] if hunks else []), []
+
+    if isinstance(src_obj, dict) and isinstance(dst_obj, dict) and "definition" in src_obj and "definition" in dst_obj:
+        rows, warnings = diff_objects(
+            {k: v for k, v in src_obj.items() if k != "definition"},
+            {k: v for k, v in dst_obj.items() if k != "definition"}
+        )
+        hunks = definition_hunks(src_obj["definition"], dst_obj["definition"], context)
+        if hunks:
+            rows.insert(0, {"attribute": "root['definition']", "diff": hunks})
+        return rows, warnings
+
+    return diff_objects(src_obj, dst_obj)
+
+def _index_columns(columns):
+    # {name: (ordinal, column)}, or None when the list is not a list of uniquely named columns
+    if not isinstance(columns, list):
+        return None
+    indexed = {}
+    for ordinal, column in enumerate(columns, 1):
+        if not isinstance(column, Mapping) or "column" not in column or column["column"] in indexed:
+            return None
+        indexed[column["column"]] = (ordinal, column)
+    return indexed
+
+def _moved_columns(src_index, dst_index):
+    """
+    Names of the columns present on both sides whose relative order changed: everything outside one
+    longest run of columns that keep their order (an O(n log n) longest increasing subsequence), so
+    a column added or dropped in the middle does not count every column after it as moved.
+    """
+    common = [name for name in src_index if name in dst_index]
+    positions = [dst_index[name][0] for name in common]
+    tails, tail_ids, previous = [], [], [None] * len(positions)
+    for i, position in enumerate(positions):
+        slot = bisect_left(tails, position)
+        if slot == len(tails):
+            tails.append(position)
+            tail_ids.append(i)
+        else:
+            tails[slot] = position
+            tail_ids[slot] = i
+        previous[i] = tail_ids[slot - 1] if slot else None
+    kept = set()
+    i = tail_ids[-1] if tail_ids else None
+    while i is not None:
+        kept.add(common[i])
+        i = previous[i]
+    return [name for name in common if name not in kept]
+
+def diff_columns(src_obj, dst_obj, report_moves=True):
+    """
+    diff_objects() for column lists, matching columns by name in one pass: removed, added and changed
+    columns, plus (with report_moves) columns whose ordinal position moved. Lists that are not uniquely
+    named columns fall back to diff_objects().
+    """
+    src_index = _index_columns(src_obj)
+    dst_index = _index_columns(dst_obj)
+    if src_index is None or dst_index is None:
+        return diff_objects(src_obj, dst_obj)
+
+    side_by_side = []
+    for name, (_, src_column) in src_index.items():
+        if name not in dst_index:
+            side_by_side.append({"attribute": f"root[{name!r}]", "source": src_column, "destination": notpresent})
+            continue
+        dst_column = dst_index[name][1]
+        if src_column == dst_column:
+            continue
+        for field in list(src_column) + [f for f in dst_column if f not in src_column]:
+            src_value = src_column.get(field, notpresent)
+            dst_value = dst_column.get(field, notpresent)
+            if src_value != dst_value:
+                side_by_side.append({"attribute": f"root[{name!r}][{field!r}]", "source": src_value, "destination": dst_value})
+
+    for name, (_, dst_column) in dst_index.items():
+        if name not in src_index:
+            side_by_side.append({"attribute": f"root[{name!r}]", "source": notpresent, "destination": dst_column})
+
+    if report_moves:
+        for name in _moved_columns(src_index, dst_index):
+            side_by_side.append({"attribute": f"root[{name!r}] ordinal", "source": src_index[name][0], "destination": dst_index[name][0]})
+
+    return side_by_side, []
+
+def diff_objects(src_obj, dst_obj):
+    """Return (side_by_side rows, parse warnings) for one object present on both sides."""
+    diff = DeepDiff(src_obj, dst_obj, ignore_order=True, view='tree')
+    side_by_side = []
+    warnings = []
+
+    for diff_group in diff.values():
+        for diff_item in diff_group:
+            try:
+                side_by_side.append({
+                    "attribute": str(diff_item.path()),
+                    "source": diff_item.t1,
+                    "destination": diff_item.t2
+                })
+            except Exception as e:
+                warnings.append(str(e))
+                continue
+
+    return side_by_side, warnings
+
+def _diff_chunk(pairs, differ=diff_objects):
+    # Runs in a worker process; returns plain data so results pickle back cheaply
+    return [(key, *differ(src_obj, dst_obj)) for key, src_obj, dst_obj in pairs]
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def normalization_options(config, dialect=None):
+    """
+    normalize_sql() keyword arguments from the "normalization" config section, or None when disabled.
+    `dialect` is the database type the definitions come from, by default config["active_db"].
+    """
+    cfg = config.get("normalization", {})
+    if not cfg.get("enabled"):
+        return None
+    return {
+        "strip_comments": cfg.get("strip_comments", True),
+        "collapse_whitespace": cfg.get("collapse_whitespace", True),
+        "strip_brackets": cfg.get("strip_brackets", True),
+        "casefold": cfg.get("casefold", False),
+        # [name] only quotes identifiers on SQL Server; elsewhere brackets are array subscripts
+        "dialect": str(dialect or config.get("active_db") or "").lower() or None
+    }
+
+def _normalize_definition(value, options):
+    if isinstance(value, dict) and "definition" in value:
+        return {**value, "definition": normalize_sql(value["definition"], **options)}
+    return normalize_sql(value, **options)
+
+def normalize_definitions(metadata, config, dialect=None):
+    """
+    Metadata with every definition-type value normalized (see utils/sql_normalizer.py), so that
+    fingerprints and diffs both work on the normalized text. Other object types are shared, not copied.
+    """
+    options = normalization_options(config, dialect)
+    if options is None:
+        return metadata
+    normalized = {}
+    for obj_type, objects in metadata.items():
+        if obj_type in DEFINITION_TYPES:
+            objects = {key: _normalize_definition(obj, options) for key, obj in objects.items()}
+        normalized[obj_type] = objects
+    return normalized
+
+def _differ(obj_type, comparison_cfg):
+    # Per object type diff function; partials of module functions, so they pickle to worker processes
+    if obj_type in DEFINITION_TYPES and comparison_cfg.get("definition_diff", True):
+        # Definitions are compared line by line into unified diff hunks instead of one whole-text change
+        return partial(diff_definition, context=comparison_cfg.get("definition_diff_context", 3))
+    if obj_type in COLUMN_TYPES and comparison_cfg.get("column_diff", True):
+        return partial(diff_columns, report_moves=comparison_cfg.get("column_moves", True))
+    return diff_objects
+
+def _ordered_types(comparison_cfg):
+    # Column order only counts when moves are reported; otherwise reordered columns stay identical
+    if comparison_cfg.get("column_diff", True) and comparison_cfg.get("column_moves", True):
+        return COLUMN_TYPES
+    return ()
+
+def fingerprint_metadata(metadata, config=None, dialect=None):
+    """Fingerprints of every object, {obj_type: {key: fingerprint}}, for reuse across comparisons."""
+    config = config or {}
+    metadata = normalize_definitions(metadata, config, dialect)
+    ordered_types = _ordered_types(config.get("comparison", {}))
+    return {
+        obj_type: {key: fingerprint(obj, obj_type in ordered_types) for key, obj in objects.items()}
+        for obj_type, objects in metadata.items() if obj_type != DEPENDENCY_KEY
+    }
+
+def compare_metadata(source_meta, dest_meta, config, logger, source_fingerprints=None, dialect=None):
     result = {}
+    profile = profiler.current()
+    with profiler.phase("compare.normalize"):
+        source_meta = normalize_definitions(source_meta, config, dialect)
+        dest_meta = normalize_definitions(dest_meta, config, dialect)
+    # The dependency graphs are not compared; they only mark what mismatched objects affect
+    graphs = [meta.get(DEPENDENCY_KEY) for meta in (source_meta, dest_meta)]
+    source_meta, dest_meta = (
+        {obj_type: objects for obj_type, objects in meta.items() if obj_type != DEPENDENCY_KEY}
+        for meta in (source_meta, dest_meta)
+    )
+    comparison_cfg = config.get("comparison", {})
+    # Hash-first fast path: objects are only diffed when their fingerprints differ
+    use_fingerprints = comparison_cfg.get("fingerprints", True)
+    workers = comparison_cfg.get("workers", 1)
+    chunk_size = max(1, comparison_cfg.get("chunk_size", 200))
+    differs = {obj_type: _differ(obj_type, comparison_cfg) for obj_type in source_meta}
+    ordered_types = _ordered_types(comparison_cfg)
+    rename_detection = comparison_cfg.get("rename_detection", False)
+    rename_threshold = comparison_cfg.get("rename_threshold", 0.8)
+    skipped = 0
+
+    candidates = {}
     for obj_type in source_meta:
+        start = time.perf_counter()
         src_objs = source_meta.get(obj_type, {})
         dst_objs = dest_meta.get(obj_type, {})
 
@@ -11,40 +240,137 @@ def compare_metadata(source_meta, dest_meta, config, logger):
             "extra_in_dest": [],
             "mismatched": []
         }
+        candidates[obj_type] = []
+        src_fingerprints = (source_fingerprints or {}).get(obj_type, {})
+        ordered = obj_type in ordered_types
 
         for key in src_objs:
             if key not in dst_objs:
                 diffs["missing_in_dest"].append(key)
+            elif use_fingerprints and (src_fingerprints.get(key) or fingerprint(src_objs[key], ordered)) == fingerprint(dst_objs[key], ordered):
+                skipped += 1
             else:
-                diff = DeepDiff(src_objs[key], dst_objs[key], ignore_order=True, view='tree')
-                side_by_side = []
-
-                for diff_group in diff.values():
-                    for diff_item in diff_group:
-                        try:
-                            side_by_side.append({
-                                "attribute": str(diff_item.path()),
-                                "source": diff_item.t1,
-                                "destination": diff_item.t2
-                            })
-                        except Exception as e:
-                            logger.warning(f"Failed to parse diff for {key}: {e}")
-                            continue
-
-                if side_by_side:
-                    diffs["mismatched"].append({
-                        "object": key,
-                        "diffs": side_by_side
-                    })
+                candidates[obj_type].append((key, src_objs[key], dst_objs[key]))
 
         for key in dst_objs:
             if key not in src_objs:
                 diffs["extra_in_dest"].append(key)
 
+        result[obj_type] = diffs
+        if profile is not None:
+            profile.record_comparison(
+                obj_type, match_seconds=time.perf_counter() - start,
+                objects=len(src_objs), candidates=len(candidates[obj_type])
+            )
+
+    total_candidates = sum(len(pairs) for pairs in candidates.values())
+    if workers > 1 and total_candidates > chunk_size:
+        with profiler.phase("compare.diff_parallel"):
+            diffed = _diff_parallel(candidates, differs, workers, chunk_size, logger)
+    else:
+        diffed = {}
+        for obj_type, pairs in candidates.items():
+            start = time.perf_counter()
+            diffed[obj_type] = _diff_chunk(pairs, differs[obj_type])
+            if profile is not None:
+                profile.record_comparison(obj_type, diff_seconds=time.perf_counter() - start)
+
+    for obj_type, diffs in result.items():
+        for key, side_by_side, warnings in diffed[obj_type]:
+            for warning in warnings:
+                logger.warning(f"Failed to parse diff for {key}: {warning}")
+            if side_by_side:
+                diffs["mismatched"].append({
+                    "object": key,
+                    "diffs": side_by_side
+                })
+
+        if rename_detection and obj_type != "constraints" and diffs["missing_in_dest"] and diffs["extra_in_dest"]:
+            with profiler.phase("compare.renames"):
+                _pair_renames(
+                    obj_type, diffs, source_meta[obj_type], dest_meta.get(obj_type, {}), rename_threshold,
+                    differs[obj_type], logger
+                )
+
         # Message if no diffs found
-        if not diffs["missing_in_dest"] and not diffs["extra_in_dest"] and not diffs["mismatched"]:
+        if not diffs["missing_in_dest"] and not diffs["extra_in_dest"] and not diffs["mismatched"] and not diffs.get("renamed"):
             diffs["info"] = "No Missing, Extras and Mismatches."
-        result[obj_type] = diffs
 
+    if any(graphs):
+        with profiler.phase("compare.dependencies"):
+            _mark_affected(result, source_meta, dest_meta, graphs, logger)
+
+    if use_fingerprints:
+        logger.info(f"Fingerprint fast path skipped diffing {skipped} identical objects.")
     logger.info("Metadata comparison completed.")
     return result
+
+def _pair_renames(obj_type, diffs, src_objs, dst_objs, threshold, differ, logger):
+    """
+    Move likely renamed/moved objects out of the missing and extra lists into diffs["renamed"]. Pairs
+    that were also edited carry the type's diff rows under "diffs", so a rename never hides a change.
+    """
+    missing = {key: src_objs[key] for key in diffs["missing_in_dest"]}
+    extra = {key: dst_objs[key] for key in diffs["extra_in_dest"]}
+    pairs = find_renames(missing, extra, threshold)
+    if not pairs:
+        return
+    paired_src = {src for src, _, _ in pairs}
+    paired_dst = {dst for _, dst, _ in pairs}
+    diffs["missing_in_dest"] = [key for key in diffs["missing_in_dest"] if key not in paired_src]
+    diffs["extra_in_dest"] = [key for key in diffs["extra_in_dest"] if key not in paired_dst]
+    diffs["renamed"] = []
+    edited = 0
+    for src, dst, similarity in sorted(pairs):
+        entry = rename_entry(src, dst, similarity)
+        side_by_side, warnings = differ(src_objs[src], dst_objs[dst])
+        for warning in warnings:
+            logger.warning(f"Failed to parse diff for {src} -> {dst}: {warning}")
+        if side_by_side:
+            entry["diffs"] = side_by_side
+            edited += 1
+        diffs["renamed"].append(entry)
+    logger.info(f"Paired {len(pairs)} renamed or moved {obj_type} ({edited} also changed).")
+
+def _mark_affected(result, source_meta, dest_meta, graphs, logger):
+    """Add diffs["affected"]: objects that transitively depend on a missing, extra, renamed or mismatched object."""
+    changed = []
+    for diffs in result.values():
+        changed += diffs["missing_in_dest"] + diffs["extra_in_dest"]
+        changed += [mismatch["object"] for mismatch in diffs["mismatched"]]
+        changed += [key for entry in diffs.get("renamed", []) for key in (entry["source"], entry["destination"])]
+    affected = affected_objects(changed, reverse_graph(*graphs))
+
+    located = {}
+    for meta in (source_meta, dest_meta):
+        for obj_type, objects in meta.items():
+            if obj_type in result and obj_type != "constraints":
+                for key in objects:
+                    located.setdefault(key.lower(), (obj_type, key))
+    names = {key.lower(): key for key in changed}
+    count = 0
+    for lowered, (root, depth) in sorted(affected.items(), key=lambda item: (item[1][1], item[0])):
+        if lowered in located:
+            obj_type, key = located[lowered]
+            result[obj_type].setdefault("affected", []).append({"object": key, "root": names[root], "depth": depth})
+            count += 1
+    logger.info(f"Marked {count} object(s) affected by {len(names)} changed object(s) through their dependencies.")
+
+def _diff_parallel(candidates, differs, workers, chunk_size, logger):
+    """
+    Shard the diff candidates of every object type into chunks and diff them on a process pool.
+    Chunks are collected in submission order, so the merged output matches the serial order.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            obj_type: [executor.submit(_diff_chunk, chunk, differs[obj_type]) for chunk in _chunks(pairs, chunk_size)]
+            for obj_type, pairs in candidates.items()
+        }
+        logger.info(
+            f"Comparing {sum(len(p) for p in candidates.values())} objects in "
+            f"{sum(len(f) for f in futures.values())} chunks on {workers} worker processes."
+        )
+        return {
+            obj_type: [item for future in type_futures for item in future.result()]
+            for obj_type, type_futures in futures.items()
+        }
@@ -1,48 +1,338 @@
+import threading
+import time
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from db_adapters.connection_pool import ConnectionPool
+from metadata_model import deferred_definition
+from object_filters import LIKE_ESCAPE, ROUTINE_TYPES, filter_objects, object_rules
+import profiler
+from snapshot import snapshot_cache_path, load_cached_snapshot, write_snapshot, apply_delta
+
+class SchemaGroups:
+    """
+    Buckets the rows of a single multi-schema catalog query by schema, so the merged result
+    follows the configured schema order and spelling rather than the server's row order.
+    """
+
+    def __init__(self, schemas, factory=dict):
+        self.factory = factory
+        self.groups = {schema: factory() for schema in schemas}
+        self._folded = {schema.lower(): schema for schema in reversed(schemas)}
+
+    def schema(self, name):
+        if name in self.groups:
+            return name
+        return self._folded.get(name.lower(), name)
+
+    def __getitem__(self, name):
+        schema = self.schema(name)
+        if schema not in self.groups:
+            self.groups[schema] = self.factory()
+        return self.groups[schema]
+
+    def merged(self, nested=False) -> dict:
+        result = {}
+        for group in self.groups.values():
+            if nested:
+                for kind, entries in group.items():
+                    result.setdefault(kind, {}).update(entries)
+            else:
+                result.update(group)
+        return result
+
+
+def _unchanged(value):
+    return value
+
 
 class BaseDBAdapter(ABC):
+    # Bind-parameter marker of the driver's paramstyle ("?" for qmark, "%s" for format)
+    param_marker = "?"
+    # Pushed-down filter patterns are case-insensitive: like_operator, and like_operand (a format string
+    # applied to both the name column and the pattern), must make the predicate match regardless of
+    # case. Plain LIKE follows the column collation, which is case-insensitive by default on SQL Server
+    like_operator = "LIKE"
+    like_operand = "{}"
+    default_batch_size = 5000
+    # SQL expression (a format string over the definition column) for the server-side hash that
+    # deferred extraction fetches instead of the text; None when the adapter cannot defer
+    hash_expression = None
+    # Object keys per IN-list when fetching deferred definitions
+    definition_batch_size = 1000
+    # True when the adapter implements delta_watermark()/delta_scope() and its extractors accept `since`
+    supports_delta = False
+
     def __init__(self, config, logger):
         self.config = config
         self.logger = logger
+        self.conn = None
+        self.dbconstr = None
+        self.pool = None
+        self.filters = object_rules(config)
+        # Set by callers that compare hashes first and fetch only the differing definitions
+        self.defer_definitions = False
+        # Cursors with a catalog query in flight, {cursor: connection}, so abort() can cancel them
+        self._active = {}
+        self._active_lock = threading.Lock()
+        self.aborted = False
 
     @abstractmethod
     def connect(self, dbconstr):
         pass
 
     @abstractmethod
-    def extract_metadata(self) -> dict:
-    
-        # DRY: Shared logic in one place  
+    def open_connection(self, dbconstr):
+        pass
+
+    def cursor(self, conn):
+        return conn.cursor()
+
+    @property
+    def batch_size(self) -> int:
+        return self.config.get("extraction", {}).get("batch_size", self.default_batch_size)
+
+    def iter_rows(self, cursor):
+        # Stream the result set in fetchmany() batches so only one batch of raw rows is held at a time
+        batch_size = self.batch_size
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+
+    def placeholders(self, values) -> str:
+        # "IN (NULL)" keeps the statement valid (and matching nothing) for an empty list
+        return ", ".join([self.param_marker] * len(values)) or "NULL"
+
+    def definition_column(self, column, keys=None):
+        """
+        (select expression, value function) for a definition column: the server-side hash and a
+        placeholder for it in phase one of a deferred extraction, otherwise the text itself.
+        """
+        if self.defer_definitions and keys is None and self.hash_expression:
+            return self.hash_expression.format(column), deferred_definition
+        return column, _unchanged
+
+    def key_filter(self, key_expression, keys):
+        """("AND ..." clause, params) limiting a query to the object keys of one deferred-definition batch."""
+        if keys is None:
+            return "", ()
+        return f" AND {key_expression} IN ({self.placeholders(keys)})", tuple(keys)
+
+    def _like_predicates(self, rules, column):
+        includes, excludes = rules.like_patterns()
+        column = self.like_operand.format(column)
+        like = f"{self.like_operator} {self.like_operand.format(self.param_marker)} ESCAPE '{LIKE_ESCAPE}'"
+        predicates = [f"({' OR '.join(f'{column} {like}' for _ in includes)})"] if includes else []
+        predicates += [f"{column} NOT {like}" for _ in excludes]
+        return predicates, [*includes, *excludes]
+
+    def name_filter(self, obj_type, column, table_column=None):
         """
-        cursor = self.conn.cursor()
-        metadata = {}
+        ("AND ..." clause, params) that pushes the filter rules of `obj_type` on `column`, and with
+        `table_column` those of the parent table, into a catalog query. Rules that LIKE cannot
+        express (regular expressions, character classes) are applied after extraction.
+        """
+        predicates, params = [], []
+        for rules_type, rules_column in ((obj_type, column), ("tables", table_column)):
+            if rules_column is not None and rules_type in self.filters:
+                type_predicates, type_params = self._like_predicates(self.filters[rules_type], rules_column)
+                predicates += type_predicates
+                params += type_params
+        return "".join(f" AND {predicate}" for predicate in predicates), tuple(params)
+
+    def routine_filter(self, column, type_column):
+        """name_filter() for a query returning both procedures and functions, each with its own rules."""
+        clauses, params = [], []
+        for routine_type, obj_type in ROUTINE_TYPES.items():
+            if obj_type in self.filters:
+                predicates, like_params = self._like_predicates(self.filters[obj_type], column)
+                if predicates:
+                    clauses.append(f" AND ({type_column} <> {self.param_marker} OR ({' AND '.join(predicates)}))")
+                    params += [routine_type, *like_params]
+        return "".join(clauses), tuple(params)
+
+    @abstractmethod
+    def extraction_tasks(self, schemas: list[str], object_types: dict) -> list:
+        """
+        Return the extractors to run as (metadata_key, extractor, extra_args) tuples.
+        Each extractor is called as extractor(cursor, schemas, *extra_args).
+        """
+        pass
+
+    def catalog_version(self, cursor, schemas: list[str]):
+        """
+        Cheap "has anything changed" probe used to validate cached snapshots.
+        Return a string that changes whenever the catalog of `schemas` changes, or None when the
+        adapter cannot tell (which disables the snapshot cache).
+        """
+        return None
+
+    def delta_watermark(self, cursor, schemas: list[str]):
+        """High-water mark (e.g. max modify date) stored with a snapshot for later delta extraction."""
+        return None
+
+    def delta_scope(self, cursor, schemas: list[str], watermark):
+        """
+        Return (changed, live): keys of the top-level objects modified since `watermark`, and keys of
+        all objects that still exist, used by snapshot.apply_delta to patch the cached metadata; None
+        when the adapter has no delta support, which falls back to a full extraction.
+        """
+        return None
+
+    def extract_metadata(self) -> dict:
         schemas = self.config["schemas_to_compare"]
-        object_types = self.config["compare_objects"]
+        cache_cfg = self.config.get("cache", {})
+        if not cache_cfg.get("enabled"):
+            return self._extract_live(schemas)
 
-        if object_types.get("tables"):
-            metadata["tables"] = {}
-            for schema in schemas:
-                metadata["tables"].update(self.get_tables(cursor, schema))
+        catalog_version = self._run_extractor(self.conn, self.catalog_version, schemas, ())
+        if catalog_version is None:
+            return self._extract_live(schemas)
 
-        if object_types.get("views"):
-            metadata["views"] = {}
-            for schema in schemas:
-                metadata["views"].update(self.get_views(cursor, schema))
+        path = snapshot_cache_path(
+            cache_cfg.get("directory", "./.schema_cache"),
+            type(self).__name__,
+            self.dbconstr or {},
+            schemas,
+            self.config["compare_objects"],
+            self.config.get("filters"),
+            deferred=self.defer_definitions and self.hash_expression is not None
+        )
+        cached = load_cached_snapshot(path, self.logger)
+        if cached is not None and cached.get("catalog_version") == catalog_version:
+            self.logger.info(f"Catalog unchanged; using cached snapshot {path}")
+            return cached["metadata"]
 
-        if object_types.get("stored_procedures"):
-            metadata["stored_procedures"] = {}
-            for schema in schemas:
-                metadata["stored_procedures"].update(self.get_routines(cursor, schema, 'P'))
+        # The watermark is taken before extracting, so anything modified meanwhile is picked up next run
+        watermark = self._run_extractor(self.conn, self.delta_watermark, schemas, ()) if self.supports_delta else None
+        if cached is not None and cached.get("watermark") and cache_cfg.get("incremental", True) and self.supports_delta:
+            self.logger.info(f"Catalog changed since snapshot {path} ({cached.get('created')}); extracting delta.")
+            metadata = self._extract_delta(schemas, cached)
+        else:
+            metadata = self._extract_live(schemas)
 
-        if object_types.get("functions"):
-            metadata["functions"] = {}
-            for schema in schemas:
-                metadata["functions"].update(self.get_routines(cursor, schema, 'FN'))
+        try:
+            write_snapshot(path, {"catalog_version": catalog_version, "watermark": watermark, "metadata": metadata})
+            self.logger.info(f"Saved metadata snapshot to {path}")
+        except Exception as e:
+            self.logger.warning(f"Failed to write metadata snapshot {path}: {e}")
+        return metadata
 
-        self.logger.info(f"Extracted metadata for schemas: {schemas}")
+    def _extract_delta(self, schemas, cached) -> dict:
+        since = cached["watermark"]
+        scope = self._run_extractor(self.conn, self.delta_scope, schemas, (since,))
+        if scope is None:
+            return self._extract_live(schemas)
+        changed, live = scope
+        delta = self._extract_live(schemas, since=since) if changed else {}
+        metadata = apply_delta(cached["metadata"], delta, changed, live)
+        self.logger.info(f"Delta extraction since {since}: {len(changed)} changed object(s) re-extracted.")
         return metadata
+
+    def _extract_live(self, schemas, since=None) -> dict:
+        tasks = self.extraction_tasks(schemas, self.config["compare_objects"])
+        max_workers = self.config.get("extraction", {}).get("max_workers", 1)
+        # Delta extractions only pass `since` through to adapters that declare supports_delta
+        kwargs = {"since": since} if since is not None else {}
+
+        if max_workers > 1 and len(tasks) > 1:
+            metadata = self._extract_pooled(tasks, schemas, max_workers, kwargs)
+        else:
+            metadata = {key: self._run_extractor(self.conn, extractor, schemas, args, kwargs) for key, extractor, args in tasks}
+        if self.filters:
+            # Client-side pass for the rules the catalog queries could not push down
+            metadata = {key: filter_objects(key, objects, self.filters) for key, objects in metadata.items()}
+        return metadata
+
+    def fetch_definitions(self, keys: dict) -> dict:
         """
-        pass
+        Phase two of a deferred extraction: the full values of the objects in `keys`
+        ({metadata_key: [object keys]}), fetched in IN-list batches of definition_batch_size.
+        """
+        schemas = self.config["schemas_to_compare"]
+        tasks = {key: (extractor, args) for key, extractor, args in self.extraction_tasks(schemas, self.config["compare_objects"])}
+        fetched = {}
+        for obj_type, object_keys in keys.items():
+            extractor, args = tasks[obj_type]
+            object_keys = sorted(object_keys)
+            for start in range(0, len(object_keys), self.definition_batch_size):
+                batch = object_keys[start:start + self.definition_batch_size]
+                fetched.setdefault(obj_type, {}).update(
+                    self._run_extractor(self.conn, extractor, schemas, args, {"keys": batch})
+                )
+        return fetched
+
+    def cancel_query(self, cursor, conn):
+        """Abort the query running on `cursor`; called from another thread while it executes."""
+        if hasattr(cursor, "cancel"):
+            cursor.cancel()
+        else:
+            conn.close()
+
+    def abort(self):
+        """
+        Cancel every catalog query this adapter has in flight and refuse to start new ones, so a
+        concurrent extraction that failed elsewhere does not wait for this side to finish.
+        """
+        self.aborted = True
+        with self._active_lock:
+            active = list(self._active.items())
+        for cursor, conn in active:
+            try:
+                self.cancel_query(cursor, conn)
+            except Exception as e:
+                self.logger.warning(f"Failed to cancel catalog query: {e}")
+        if active:
+            self.logger.info(f"Cancelled {len(active)} in-flight catalog quer{'y' if len(active) == 1 else 'ies'}.")
+
+    def _run_extractor(self, conn, extractor, schemas, args, kwargs=None):
+        if self.aborted:
+            raise RuntimeError("Extraction aborted")
+        profile = profiler.current()
+        raw_cursor = cursor = self.cursor(conn)
+        if profile is not None:
+            cursor = profiler.ProfiledCursor(cursor)
+        with self._active_lock:
+            self._active[raw_cursor] = conn
+        start = time.perf_counter()
+        try:
+            return extractor(cursor, schemas, *args, **(kwargs or {}))
+        finally:
+            with self._active_lock:
+                self._active.pop(raw_cursor, None)
+            cursor.close()
+            if profile is not None:
+                dbconstr = self.dbconstr or {}
+                name = extractor.__name__ + (f"({', '.join(map(str, args))})" if args else "")
+                profile.record_extractor(
+                    f"{type(self).__name__} {dbconstr.get('server')}/{dbconstr.get('database')}",
+                    name, time.perf_counter() - start, cursor.stats
+                )
+
+    def _extract_pooled(self, tasks, schemas, max_workers, kwargs) -> dict:
+        # Every object-type extractor borrows its own connection, so slow catalog queries
+        # (e.g. module definitions) overlap with the column and index queries.
+        if self.pool is None:
+            self.pool = ConnectionPool(lambda: self.open_connection(self.dbconstr), self.logger, seed=self.conn)
+
+        def run(extractor, args):
+            with self.pool.connection() as conn:
+                return self._run_extractor(conn, extractor, schemas, args, kwargs)
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(tasks)), thread_name_prefix="catalog") as executor:
+            futures = [(key, executor.submit(run, extractor, args)) for key, extractor, args in tasks]
+            try:
+                return {key: future.result() for key, future in futures}
+            except Exception:
+                for _, future in futures:
+                    future.cancel()
+                raise
+
+    def close_pool(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
 
     @abstractmethod
     def extract_tables(self, cursor, schema: str) -> dict:
@@ -55,7 +345,7 @@ class BaseDBAdapter(ABC):
     @abstractmethod
     def extract_routines(self, cursor, schema: str, routine_type: str) -> dict:
         pass
-    
+
     @abstractmethod
     def close(self):
         pass
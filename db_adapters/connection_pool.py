@@ -0,0 +1,45 @@
+import queue
+import threading
+from contextlib import contextmanager
+
+
+class ConnectionPool:
+    """
+    Minimal thread-safe pool of DB-API connections.
+    Connections are opened lazily through `factory`, so the pool never grows beyond the number of
+    threads borrowing from it at the same time. A `seed` connection is lent out first but is owned
+    (and closed) by the caller, not by the pool.
+    """
+
+    def __init__(self, factory, logger, seed=None):
+        self.factory = factory
+        self.logger = logger
+        self._idle = queue.LifoQueue()
+        self._owned = []
+        self._lock = threading.Lock()
+        if seed is not None:
+            self._idle.put(seed)
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self.factory()
+            with self._lock:
+                self._owned.append(conn)
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        with self._lock:
+            owned, self._owned = self._owned, []
+        for conn in owned:
+            try:
+                conn.close()
+            except Exception as e:
+                self.logger.warning(f"Failed to close pooled connection: {e}")
+        if owned:
+            self.logger.info(f"Closed {len(owned)} pooled connection(s).")
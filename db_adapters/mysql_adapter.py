@@ -1,146 +1,221 @@
+import sys
 import mysql.connector
-from db_adapters.base_db_adapter import BaseDBAdapter
+from db_adapters.base_db_adapter import BaseDBAdapter, SchemaGroups
+from metadata_model import record_type
+
+Column = record_type(("column", "data_type", "nullable", "max_length"))
+IndexColumn = record_type(("column", "non_unique"))
 
 class MySQLAdapter(BaseDBAdapter):
-    def __init__(self, config, logger):
-        self.config = config
-        self.logger = logger
-        self.conn = None
+    param_marker = "%s"
+    hash_expression = "SHA2({}, 256)"
+    # INFORMATION_SCHEMA name columns are case-sensitive (utf8mb3_bin) with lower_case_table_names=0,
+    # the default on Linux, so both sides of a pushed-down filter are lowercased
+    like_operand = "LOWER({})"
 
     def connect(self, dbconstr):
         try:
-            self.conn = mysql.connector.connect(
-                host=dbconstr["server"],
-                database=dbconstr["database"],
-                user=dbconstr["username"],
-                password=dbconstr["password"],
-                port=dbconstr.get("port", 3306)
-            )
+            self.dbconstr = dbconstr
+            self.conn = self.open_connection(dbconstr)
             self.logger.info("Connected to MySQL {host}-{database}")
             return self.conn
         except Exception as e:
             self.logger.exception(f"MySQL connection error: {str(e)}")
             raise
 
-    def extract_metadata(self) -> dict:
-        cursor = self.conn.cursor(dictionary=True)
-        metadata = {}
-        schemas = self.config["schemas_to_compare"]
-        types = self.config["compare_objects"]
+    def open_connection(self, dbconstr):
+        return mysql.connector.connect(
+            host=dbconstr["server"],
+            database=dbconstr["database"],
+            user=dbconstr["username"],
+            password=dbconstr["password"],
+            port=dbconstr.get("port", 3306)
+        )
+
+    def cursor(self, conn):
+        # Unbuffered: rows stay on the server until fetched in batches
+        return conn.cursor(dictionary=True, buffered=False)
 
+    def cancel_query(self, cursor, conn):
+        # The protocol has no out-of-band cancel: kill the statement from a separate connection
+        killer = self.open_connection(self.dbconstr)
+        try:
+            killer.cursor().execute(f"KILL QUERY {int(conn.connection_id)}")
+        finally:
+            killer.close()
+
+    def extraction_tasks(self, schemas, types):
+        tasks = []
         if types.get("tables"):
-            metadata["tables"] = self.extract_tables(cursor, schemas)
+            tasks.append(("tables", self.extract_tables, ()))
         if types.get("views"):
-            metadata["views"] = self.extract_views(cursor, schemas)
+            tasks.append(("views", self.extract_views, ()))
         if types.get("stored_procedures") or types.get("functions"):
-            metadata["routines"] = self.extract_routines(cursor, schemas)
+            tasks.append(("routines", self.extract_routines, ()))
         if types.get("constraints"):
-            metadata["constraints"] = self.extract_constraints(cursor, schemas)
+            tasks.append(("constraints", self.extract_constraints, ()))
         if types.get("indexes"):
-            metadata["indexes"] = self.extract_indexes(cursor, schemas)
+            tasks.append(("indexes", self.extract_indexes, ()))
         if types.get("triggers"):
-            metadata["triggers"] = self.extract_triggers(cursor, schemas)
+            tasks.append(("triggers", self.extract_triggers, ()))
+        if types.get("dependencies"):
+            tasks.append(("dependencies", self.extract_dependencies, ()))
+
+        return tasks
 
-        return metadata
+    # (catalog table, schema column, columns checksummed) for catalog_version. Timestamps alone miss
+    # CREATE OR REPLACE VIEW (views have no CREATE_TIME) and instant DDL, which renames or retypes
+    # a column without moving CREATE_TIME, so the content extraction reads is checksummed instead
+    VERSION_PROBES = (
+        ("TABLES", "TABLE_SCHEMA", "TABLE_NAME, CREATE_TIME"),
+        ("COLUMNS", "TABLE_SCHEMA", "TABLE_NAME, COLUMN_NAME, ORDINAL_POSITION, COLUMN_TYPE, IS_NULLABLE"),
+        ("VIEWS", "TABLE_SCHEMA", "TABLE_NAME, VIEW_DEFINITION"),
+        ("ROUTINES", "ROUTINE_SCHEMA", "ROUTINE_NAME, ROUTINE_TYPE, LAST_ALTERED, ROUTINE_DEFINITION"),
+        ("TABLE_CONSTRAINTS", "TABLE_SCHEMA", "TABLE_NAME, CONSTRAINT_NAME, CONSTRAINT_TYPE"),
+        ("STATISTICS", "TABLE_SCHEMA", "TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX, COLUMN_NAME, NON_UNIQUE"),
+        ("TRIGGERS", "TRIGGER_SCHEMA", "EVENT_OBJECT_TABLE, TRIGGER_NAME, CREATED, ACTION_STATEMENT"),
+    )
+
+    def catalog_version(self, cursor, schemas):
+        # A row count and an order-independent sum of per-row CRC32s per catalog table
+        in_list = self.placeholders(schemas)
+        probes = ",\n".join(
+            f"(SELECT CONCAT(COUNT(*), '|', COALESCE(SUM(CRC32(CONCAT_WS('|', {schema_column}, {columns}))), 0)) "
+            f"FROM INFORMATION_SCHEMA.{table} WHERE {schema_column} IN ({in_list})) AS {table}_VERSION"
+            for table, schema_column, columns in self.VERSION_PROBES
+        )
+        cursor.execute(f"SELECT {probes}", tuple(schemas) * len(self.VERSION_PROBES))
+        row = cursor.fetchall()[0]
+        return "|".join(str(value) for value in row.values())
 
     def extract_tables(self, cursor, schemas):
-        result = {}
-        for schema in schemas:
-            cursor.execute("""
-                SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE, IS_NULLABLE, CHARACTER_MAXIMUM_LENGTH
-                FROM INFORMATION_SCHEMA.COLUMNS
-                WHERE TABLE_SCHEMA = %s
-                ORDER BY TABLE_NAME, ORDINAL_POSITION
-            """, (schema,))
-            for row in cursor.fetchall():
-                tbl = f"{schema}.{row['TABLE_NAME']}"
-                result.setdefault(tbl, []).append({
-                    "column": row["COLUMN_NAME"],
-                    "data_type": row["DATA_TYPE"],
-                    "nullable": row["IS_NULLABLE"],
-                    "max_length": row["CHARACTER_MAXIMUM_LENGTH"]
-                })
+        result = SchemaGroups(schemas)
+        filter_clause, filter_params = self.name_filter("tables", "TABLE_NAME")
+        cursor.execute(f"""
+            SELECT TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME, DATA_TYPE, IS_NULLABLE, CHARACTER_MAXIMUM_LENGTH
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA IN ({self.placeholders(schemas)}){filter_clause}
+            ORDER BY TABLE_SCHEMA, TABLE_NAME, ORDINAL_POSITION
+        """, tuple(schemas) + filter_params)
+        for row in self.iter_rows(cursor):
+            schema = result.schema(row["TABLE_SCHEMA"])
+            tbl = f"{schema}.{row['TABLE_NAME']}"
+            result[schema].setdefault(tbl, []).append(
+                Column(row["COLUMN_NAME"], row["DATA_TYPE"], row["IS_NULLABLE"], row["CHARACTER_MAXIMUM_LENGTH"])
+            )
         self.logger.info(f"Extracted tables from MySQL: {schemas}")
-        return result
-
-    def extract_views(self, cursor, schemas):
-        views = {}
-        for schema in schemas:
-            cursor.execute("""
-                SELECT TABLE_NAME, VIEW_DEFINITION
-                FROM INFORMATION_SCHEMA.VIEWS
-                WHERE TABLE_SCHEMA = %s
-            """, (schema,))
-            for row in cursor.fetchall():
-                views[f"{schema}.{row['TABLE_NAME']}"] = row["VIEW_DEFINITION"]
+        return result.merged()
+
+    def extract_views(self, cursor, schemas, keys=None):
+        views = SchemaGroups(schemas)
+        filter_clause, filter_params = self.name_filter("views", "TABLE_NAME")
+        definition, as_value = self.definition_column("VIEW_DEFINITION", keys)
+        key_clause, key_params = self.key_filter("CONCAT(TABLE_SCHEMA, '.', TABLE_NAME)", keys)
+        cursor.execute(f"""
+            SELECT TABLE_SCHEMA, TABLE_NAME, {definition} AS VIEW_DEFINITION
+            FROM INFORMATION_SCHEMA.VIEWS
+            WHERE TABLE_SCHEMA IN ({self.placeholders(schemas)}){filter_clause}{key_clause}
+        """, tuple(schemas) + filter_params + key_params)
+        for row in self.iter_rows(cursor):
+            schema = views.schema(row["TABLE_SCHEMA"])
+            views[schema][f"{schema}.{row['TABLE_NAME']}"] = as_value(row["VIEW_DEFINITION"])
         self.logger.info("Extracted views from MySQL.")
-        return views
-
-    def extract_routines(self, cursor, schemas):
-        routines = {}
-        for schema in schemas:
-            cursor.execute("""
-                SELECT ROUTINE_NAME, ROUTINE_TYPE, ROUTINE_DEFINITION
-                FROM INFORMATION_SCHEMA.ROUTINES
-                WHERE ROUTINE_SCHEMA = %s
-            """, (schema,))
-            for row in cursor.fetchall():
-                routines[f"{schema}.{row['ROUTINE_NAME']}"] = {
-                    "type": row["ROUTINE_TYPE"],
-                    "definition": row["ROUTINE_DEFINITION"]
-                }
+        return views.merged()
+
+    def extract_routines(self, cursor, schemas, keys=None):
+        routines = SchemaGroups(schemas)
+        filter_clause, filter_params = self.routine_filter("ROUTINE_NAME", "ROUTINE_TYPE")
+        definition, as_value = self.definition_column("ROUTINE_DEFINITION", keys)
+        key_clause, key_params = self.key_filter("CONCAT(ROUTINE_SCHEMA, '.', ROUTINE_NAME)", keys)
+        cursor.execute(f"""
+            SELECT ROUTINE_SCHEMA, ROUTINE_NAME, ROUTINE_TYPE, {definition} AS ROUTINE_DEFINITION
+            FROM INFORMATION_SCHEMA.ROUTINES
+            WHERE ROUTINE_SCHEMA IN ({self.placeholders(schemas)}){filter_clause}{key_clause}
+        """, tuple(schemas) + filter_params + key_params)
+        for row in self.iter_rows(cursor):
+            schema = routines.schema(row["ROUTINE_SCHEMA"])
+            routines[schema][f"{schema}.{row['ROUTINE_NAME']}"] = {
+                "type": row["ROUTINE_TYPE"],
+                "definition": as_value(row["ROUTINE_DEFINITION"])
+            }
         self.logger.info("Extracted routines from MySQL.")
-        return routines
+        return routines.merged()
 
     def extract_constraints(self, cursor, schemas):
-        constraints = {"primary_keys": {}, "foreign_keys": {}, "unique_constraints": {}}
-        for schema in schemas:
-            cursor.execute("""
-                SELECT TABLE_NAME, CONSTRAINT_NAME, CONSTRAINT_TYPE
-                FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS
-                WHERE CONSTRAINT_TYPE IN ('PRIMARY KEY', 'FOREIGN KEY', 'UNIQUE') AND TABLE_SCHEMA = %s
-            """, (schema,))
-            for row in cursor.fetchall():
-                full_table = f"{schema}.{row['TABLE_NAME']}"
-                kind = row["CONSTRAINT_TYPE"].lower().replace(" ", "_")
-                constraints.setdefault(kind, {}).setdefault(full_table, []).append(row["CONSTRAINT_NAME"])
+        constraints = SchemaGroups(schemas, lambda: {"primary_keys": {}, "foreign_keys": {}, "unique_constraints": {}})
+        filter_clause, filter_params = self.name_filter("constraints", None, "TABLE_NAME")
+        cursor.execute(f"""
+            SELECT TABLE_SCHEMA, TABLE_NAME, CONSTRAINT_NAME, CONSTRAINT_TYPE
+            FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS
+            WHERE CONSTRAINT_TYPE IN ('PRIMARY KEY', 'FOREIGN KEY', 'UNIQUE') AND TABLE_SCHEMA IN ({self.placeholders(schemas)}){filter_clause}
+        """, tuple(schemas) + filter_params)
+        for row in self.iter_rows(cursor):
+            schema = constraints.schema(row["TABLE_SCHEMA"])
+            full_table = f"{schema}.{row['TABLE_NAME']}"
+            kind = row["CONSTRAINT_TYPE"].lower().replace(" ", "_")
+            constraints[schema].setdefault(kind, {}).setdefault(full_table, []).append(sys.intern(row["CONSTRAINT_NAME"]))
         self.logger.info("Extracted constraints from MySQL.")
-        return constraints
+        return constraints.merged(nested=True)
 
     def extract_indexes(self, cursor, schemas):
-        indexes = {}
-        for schema in schemas:
-            cursor.execute("""
-                SELECT TABLE_NAME, INDEX_NAME, COLUMN_NAME, NON_UNIQUE
-                FROM INFORMATION_SCHEMA.STATISTICS
-                WHERE TABLE_SCHEMA = %s
-            """, (schema,))
-            for row in cursor.fetchall():
-                key = f"{schema}.{row['TABLE_NAME']}.{row['INDEX_NAME']}"
-                indexes.setdefault(key, []).append({
-                    "column": row["COLUMN_NAME"],
-                    "non_unique": bool(row["NON_UNIQUE"])
-                })
+        indexes = SchemaGroups(schemas)
+        filter_clause, filter_params = self.name_filter("indexes", "INDEX_NAME", "TABLE_NAME")
+        cursor.execute(f"""
+            SELECT TABLE_SCHEMA, TABLE_NAME, INDEX_NAME, COLUMN_NAME, NON_UNIQUE
+            FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA IN ({self.placeholders(schemas)}){filter_clause}
+        """, tuple(schemas) + filter_params)
+        for row in self.iter_rows(cursor):
+            schema = indexes.schema(row["TABLE_SCHEMA"])
+            key = f"{schema}.{row['TABLE_NAME']}.{row['INDEX_NAME']}"
+            indexes[schema].setdefault(key, []).append(IndexColumn(row["COLUMN_NAME"], bool(row["NON_UNIQUE"])))
         self.logger.info("Extracted indexes from MySQL.")
-        return indexes
-
-    def extract_triggers(self, cursor, schemas):
-        triggers = {}
-        for schema in schemas:
-            cursor.execute("""
-                SELECT TRIGGER_NAME, EVENT_OBJECT_TABLE, ACTION_STATEMENT
-                FROM INFORMATION_SCHEMA.TRIGGERS
-                WHERE TRIGGER_SCHEMA = %s
-            """, (schema,))
-            for row in cursor.fetchall():
-                key = f"{schema}.{row['EVENT_OBJECT_TABLE']}.{row['TRIGGER_NAME']}"
-                triggers[key] = {
-                    "definition": row["ACTION_STATEMENT"]
-                }
+        return indexes.merged()
+
+    def extract_triggers(self, cursor, schemas, keys=None):
+        triggers = SchemaGroups(schemas)
+        filter_clause, filter_params = self.name_filter("triggers", "TRIGGER_NAME", "EVENT_OBJECT_TABLE")
+        definition, as_value = self.definition_column("ACTION_STATEMENT", keys)
+        key_clause, key_params = self.key_filter("CONCAT(TRIGGER_SCHEMA, '.', EVENT_OBJECT_TABLE, '.', TRIGGER_NAME)", keys)
+        cursor.execute(f"""
+            SELECT TRIGGER_SCHEMA, TRIGGER_NAME, EVENT_OBJECT_TABLE, {definition} AS ACTION_STATEMENT
+            FROM INFORMATION_SCHEMA.TRIGGERS
+            WHERE TRIGGER_SCHEMA IN ({self.placeholders(schemas)}){filter_clause}{key_clause}
+        """, tuple(schemas) + filter_params + key_params)
+        for row in self.iter_rows(cursor):
+            schema = triggers.schema(row["TRIGGER_SCHEMA"])
+            key = f"{schema}.{row['EVENT_OBJECT_TABLE']}.{row['TRIGGER_NAME']}"
+            triggers[schema][key] = {
+                "definition": as_value(row["ACTION_STATEMENT"])
+            }
         self.logger.info("Extracted triggers from MySQL.")
-        return triggers
+        return triggers.merged()
+
+    def extract_dependencies(self, cursor, schemas):
+        # MySQL records no dependencies of routines; views list the tables and views they read,
+        # triggers depend on their table
+        dependencies = SchemaGroups(schemas)
+        in_list = self.placeholders(schemas)
+        cursor.execute(f"""
+            SELECT VIEW_SCHEMA AS OBJECT_SCHEMA, NULL AS PARENT_NAME, VIEW_NAME AS OBJECT_NAME,
+                TABLE_SCHEMA AS REFERENCED_SCHEMA, TABLE_NAME AS REFERENCED_NAME
+            FROM INFORMATION_SCHEMA.VIEW_TABLE_USAGE
+            WHERE VIEW_SCHEMA IN ({in_list})
+            UNION ALL
+            SELECT TRIGGER_SCHEMA, EVENT_OBJECT_TABLE, TRIGGER_NAME, EVENT_OBJECT_SCHEMA, EVENT_OBJECT_TABLE
+            FROM INFORMATION_SCHEMA.TRIGGERS
+            WHERE TRIGGER_SCHEMA IN ({in_list})
+        """, tuple(schemas) * 2)
+        for row in self.iter_rows(cursor):
+            schema = dependencies.schema(row["OBJECT_SCHEMA"])
+            key = f"{schema}.{row['PARENT_NAME']}.{row['OBJECT_NAME']}" if row["PARENT_NAME"] else f"{schema}.{row['OBJECT_NAME']}"
+            referenced = sys.intern(f"{dependencies.schema(row['REFERENCED_SCHEMA'])}.{row['REFERENCED_NAME']}")
+            dependencies[schema].setdefault(key, []).append(referenced)
+        self.logger.info("Extracted dependencies from MySQL.")
+        return dependencies.merged()
 
     def close(self):
+        self.close_pool()
         if self.conn:
             self.conn.close()
             self.logger.info("MySQL connection closed.")
@@ -1,151 +1,239 @@
+import itertools
+import sys
 import psycopg2
-from db_adapters.base_db_adapter import BaseDBAdapter
+from db_adapters.base_db_adapter import BaseDBAdapter, SchemaGroups
+from metadata_model import record_type
+
+Column = record_type(("column", "data_type", "nullable", "max_length"))
+Constraint = record_type(("name", "definition"))
 
 class PostgreSQLAdapter(BaseDBAdapter):
-    def __init__(self, config, logger):
-        self.config = config
-        self.logger = logger
-        self.conn = None
+    param_marker = "%s"
+    like_operator = "ILIKE"
+    hash_expression = "md5({})"
+    _cursor_ids = itertools.count(1)
 
     def connect(self, dbconstr):
         try:
-            self.conn = psycopg2.connect(
-                host=dbconstr["server"],
-                dbname=dbconstr["database"],
-                user=dbconstr["username"],
-                password=dbconstr["password"],
-                port=dbconstr.get("port", 5432)
-            )
+            self.dbconstr = dbconstr
+            self.conn = self.open_connection(dbconstr)
             self.logger.info("Connected to PostgreSQL {host}-{dbname}")
             return self.conn
         except Exception as e:
             self.logger.exception(f"PostgreSQL connection error: {str(e)}")
             raise
 
-    def extract_metadata(self) -> dict:
-        cursor = self.conn.cursor()
-        metadata = {}
-        schemas = self.config["schemas_to_compare"]
-        types = self.config["compare_objects"]
+    def open_connection(self, dbconstr):
+        return psycopg2.connect(
+            host=dbconstr["server"],
+            dbname=dbconstr["database"],
+            user=dbconstr["username"],
+            password=dbconstr["password"],
+            port=dbconstr.get("port", 5432)
+        )
+
+    def cursor(self, conn):
+        # Named (server-side) cursor: the result set is materialised on the server and
+        # streamed to the client in batch_size chunks
+        cursor = conn.cursor(name=f"schema_diff_{next(self._cursor_ids)}")
+        cursor.itersize = self.batch_size
+        return cursor
 
+    def cancel_query(self, cursor, conn):
+        # Sends a cancel request for whatever the connection is running; safe from another thread
+        conn.cancel()
+
+    def extraction_tasks(self, schemas, types):
+        tasks = []
         if types.get("tables"):
-            metadata["tables"] = self.extract_tables(cursor, schemas)
+            tasks.append(("tables", self.extract_tables, ()))
         if types.get("views"):
-            metadata["views"] = self.extract_views(cursor, schemas)
+            tasks.append(("views", self.extract_views, ()))
         if types.get("stored_procedures") or types.get("functions"):
-            metadata["routines"] = self.extract_routines(cursor, schemas)
+            tasks.append(("routines", self.extract_routines, ()))
         if types.get("constraints"):
-            metadata["constraints"] = self.extract_constraints(cursor, schemas)
+            tasks.append(("constraints", self.extract_constraints, ()))
         if types.get("indexes"):
-            metadata["indexes"] = self.extract_indexes(cursor, schemas)
+            tasks.append(("indexes", self.extract_indexes, ()))
         if types.get("triggers"):
-            metadata["triggers"] = self.extract_triggers(cursor, schemas)
+            tasks.append(("triggers", self.extract_triggers, ()))
+        if types.get("dependencies"):
+            tasks.append(("dependencies", self.extract_dependencies, ()))
+
+        return tasks
 
-        return metadata
+    def catalog_version(self, cursor, schemas):
+        # Any DDL rewrites the affected catalog rows, which gives them a new xmin
+        cursor.execute("""
+            SELECT
+                (SELECT count(*) || '|' || coalesce(sum(hashtext(c.oid::text || ':' || c.xmin::text)), 0)
+                 FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+                 WHERE n.nspname = ANY(%s::text[])),
+                (SELECT count(*) || '|' || coalesce(sum(hashtext(a.attrelid::text || ':' || a.attnum || ':' || a.xmin::text)), 0)
+                 FROM pg_attribute a JOIN pg_class c ON c.oid = a.attrelid JOIN pg_namespace n ON n.oid = c.relnamespace
+                 WHERE n.nspname = ANY(%s::text[])),
+                (SELECT count(*) || '|' || coalesce(sum(hashtext(p.oid::text || ':' || p.xmin::text)), 0)
+                 FROM pg_proc p JOIN pg_namespace n ON n.oid = p.pronamespace
+                 WHERE n.nspname = ANY(%s::text[])),
+                (SELECT count(*) || '|' || coalesce(sum(hashtext(t.oid::text || ':' || t.xmin::text)), 0)
+                 FROM pg_trigger t JOIN pg_class c ON c.oid = t.tgrelid JOIN pg_namespace n ON n.oid = c.relnamespace
+                 WHERE n.nspname = ANY(%s::text[])),
+                (SELECT count(*) || '|' || coalesce(sum(hashtext(con.oid::text || ':' || con.xmin::text)), 0)
+                 FROM pg_constraint con JOIN pg_namespace n ON n.oid = con.connamespace
+                 WHERE n.nspname = ANY(%s::text[])),
+                (SELECT count(*) || '|' || coalesce(sum(hashtext(r.oid::text || ':' || r.xmin::text)), 0)
+                 FROM pg_rewrite r JOIN pg_class c ON c.oid = r.ev_class JOIN pg_namespace n ON n.oid = c.relnamespace
+                 WHERE n.nspname = ANY(%s::text[]))
+        """, (list(schemas),) * 6)
+        row = cursor.fetchall()[0]
+        return "|".join(str(value) for value in row)
 
     def extract_tables(self, cursor, schemas):
-        result = {}
-        for schema in schemas:
-            cursor.execute("""
-                SELECT table_name, column_name, data_type, is_nullable, character_maximum_length
-                FROM information_schema.columns
-                WHERE table_schema = %s
-                ORDER BY table_name, ordinal_position
-            """, (schema,))
-            for row in cursor.fetchall():
-                tbl = f"{schema}.{row[0]}"
-                result.setdefault(tbl, []).append({
-                    "column": row[1],
-                    "data_type": row[2],
-                    "nullable": row[3],
-                    "max_length": row[4]
-                })
+        result = SchemaGroups(schemas)
+        filter_clause, filter_params = self.name_filter("tables", "table_name")
+        cursor.execute(f"""
+            SELECT table_schema, table_name, column_name, data_type, is_nullable, character_maximum_length
+            FROM information_schema.columns
+            WHERE table_schema = ANY(%s::text[]){filter_clause}
+            ORDER BY table_schema, table_name, ordinal_position
+        """, (list(schemas),) + filter_params)
+        for row in self.iter_rows(cursor):
+            tbl = f"{row[0]}.{row[1]}"
+            result[row[0]].setdefault(tbl, []).append(Column(row[2], row[3], row[4], row[5]))
         self.logger.info("Extracted tables from PostgreSQL.")
-        return result
-
-    def extract_views(self, cursor, schemas):
-        views = {}
-        for schema in schemas:
-            cursor.execute("""
-                SELECT table_name, view_definition
-                FROM information_schema.views
-                WHERE table_schema = %s
-            """, (schema,))
-            for row in cursor.fetchall():
-                views[f"{schema}.{row[0]}"] = row[1]
+        return result.merged()
+
+    def extract_views(self, cursor, schemas, keys=None):
+        views = SchemaGroups(schemas)
+        filter_clause, filter_params = self.name_filter("views", "table_name")
+        definition, as_value = self.definition_column("view_definition", keys)
+        key_clause, key_params = self.key_filter("table_schema || '.' || table_name", keys)
+        cursor.execute(f"""
+            SELECT table_schema, table_name, {definition}
+            FROM information_schema.views
+            WHERE table_schema = ANY(%s::text[]){filter_clause}{key_clause}
+        """, (list(schemas),) + filter_params + key_params)
+        for row in self.iter_rows(cursor):
+            views[row[0]][f"{row[0]}.{row[1]}"] = as_value(row[2])
         self.logger.info("Extracted views from PostgreSQL.")
-        return views
-
-    def extract_routines(self, cursor, schemas):
-        routines = {}
-        for schema in schemas:
-            cursor.execute("""
-                SELECT routine_name, routine_type, routine_definition
-                FROM information_schema.routines
-                WHERE specific_schema = %s
-            """, (schema,))
-            for row in cursor.fetchall():
-                routines[f"{schema}.{row[0]}"] = {
-                    "type": row[1],
-                    "definition": row[2]
-                }
+        return views.merged()
+
+    def extract_routines(self, cursor, schemas, keys=None):
+        routines = SchemaGroups(schemas)
+        filter_clause, filter_params = self.routine_filter("routine_name", "routine_type")
+        definition, as_value = self.definition_column("routine_definition", keys)
+        key_clause, key_params = self.key_filter("specific_schema || '.' || routine_name", keys)
+        cursor.execute(f"""
+            SELECT specific_schema, routine_name, routine_type, {definition}
+            FROM information_schema.routines
+            WHERE specific_schema = ANY(%s::text[]){filter_clause}{key_clause}
+        """, (list(schemas),) + filter_params + key_params)
+        for row in self.iter_rows(cursor):
+            routines[row[0]][f"{row[0]}.{row[1]}"] = {
+                "type": row[2],
+                "definition": as_value(row[3])
+            }
         self.logger.info("Extracted routines from PostgreSQL.")
-        return routines
+        return routines.merged()
 
     def extract_constraints(self, cursor, schemas):
-        constraints = {"primary_keys": {}, "foreign_keys": {}, "unique_constraints": {}}
-        for schema in schemas:
-            cursor.execute("""
-                SELECT conname, contype, conrelid::regclass::text, pg_get_constraintdef(oid)
-                FROM pg_constraint
-                WHERE connamespace = (SELECT oid FROM pg_namespace WHERE nspname = %s)
-            """, (schema,))
-            for row in cursor.fetchall():
-                full_table = row[2]
-                con_type = row[1]
-                record = {"name": row[0], "definition": row[3]}
-                if con_type == 'p':
-                    constraints["primary_keys"].setdefault(full_table, []).append(record)
-                elif con_type == 'u':
-                    constraints["unique_constraints"].setdefault(full_table, []).append(record)
-                elif con_type == 'f':
-                    constraints["foreign_keys"].setdefault(full_table, []).append(record)
+        constraints = SchemaGroups(schemas, lambda: {"primary_keys": {}, "foreign_keys": {}, "unique_constraints": {}})
+        filter_clause, filter_params = self.name_filter(
+            "constraints", None, "(SELECT rel.relname FROM pg_class rel WHERE rel.oid = con.conrelid)"
+        )
+        cursor.execute(f"""
+            SELECT ns.nspname, con.conname, con.contype, con.conrelid::regclass::text, pg_get_constraintdef(con.oid)
+            FROM pg_constraint con
+            JOIN pg_namespace ns ON ns.oid = con.connamespace
+            WHERE ns.nspname = ANY(%s::text[]){filter_clause}
+        """, (list(schemas),) + filter_params)
+        for row in self.iter_rows(cursor):
+            group = constraints[row[0]]
+            full_table = row[3]
+            con_type = row[2]
+            record = Constraint(row[1], row[4])
+            if con_type == 'p':
+                group["primary_keys"].setdefault(full_table, []).append(record)
+            elif con_type == 'u':
+                group["unique_constraints"].setdefault(full_table, []).append(record)
+            elif con_type == 'f':
+                group["foreign_keys"].setdefault(full_table, []).append(record)
         self.logger.info("Extracted constraints from PostgreSQL.")
-        return constraints
+        return constraints.merged(nested=True)
 
     def extract_indexes(self, cursor, schemas):
-        indexes = {}
-        for schema in schemas:
-            cursor.execute("""
-                SELECT tab.relname as table_name, idx.relname as index_name, a.attname as column_name
-                FROM pg_class tab
-                JOIN pg_index i ON tab.oid = i.indrelid
-                JOIN pg_class idx ON idx.oid = i.indexrelid
-                JOIN pg_attribute a ON a.attrelid = tab.oid AND a.attnum = ANY(i.indkey)
-                JOIN pg_namespace ns ON ns.oid = tab.relnamespace
-                WHERE ns.nspname = %s
-            """, (schema,))
-            for row in cursor.fetchall():
-                key = f"{schema}.{row[0]}.{row[1]}"
-                indexes.setdefault(key, []).append(row[2])
+        indexes = SchemaGroups(schemas)
+        filter_clause, filter_params = self.name_filter("indexes", "idx.relname", "tab.relname")
+        cursor.execute(f"""
+            SELECT ns.nspname as schema_name, tab.relname as table_name, idx.relname as index_name, a.attname as column_name
+            FROM pg_class tab
+            JOIN pg_index i ON tab.oid = i.indrelid
+            JOIN pg_class idx ON idx.oid = i.indexrelid
+            JOIN pg_attribute a ON a.attrelid = tab.oid AND a.attnum = ANY(i.indkey)
+            JOIN pg_namespace ns ON ns.oid = tab.relnamespace
+            WHERE ns.nspname = ANY(%s::text[]){filter_clause}
+        """, (list(schemas),) + filter_params)
+        for row in self.iter_rows(cursor):
+            key = f"{row[0]}.{row[1]}.{row[2]}"
+            indexes[row[0]].setdefault(key, []).append(sys.intern(row[3]))
         self.logger.info("Extracted indexes from PostgreSQL.")
-        return indexes
-
-    def extract_triggers(self, cursor, schemas):
-        triggers = {}
-        for schema in schemas:
-            cursor.execute("""
-                SELECT event_object_table, trigger_name, action_statement
-                FROM information_schema.triggers
-                WHERE trigger_schema = %s
-            """, (schema,))
-            for row in cursor.fetchall():
-                key = f"{schema}.{row[0]}.{row[1]}"
-                triggers[key] = {"definition": row[2]}
+        return indexes.merged()
+
+    def extract_triggers(self, cursor, schemas, keys=None):
+        triggers = SchemaGroups(schemas)
+        filter_clause, filter_params = self.name_filter("triggers", "trigger_name", "event_object_table")
+        definition, as_value = self.definition_column("action_statement", keys)
+        key_clause, key_params = self.key_filter("trigger_schema || '.' || event_object_table || '.' || trigger_name", keys)
+        cursor.execute(f"""
+            SELECT trigger_schema, event_object_table, trigger_name, {definition}
+            FROM information_schema.triggers
+            WHERE trigger_schema = ANY(%s::text[]){filter_clause}{key_clause}
+        """, (list(schemas),) + filter_params + key_params)
+        for row in self.iter_rows(cursor):
+            key = f"{row[0]}.{row[1]}.{row[2]}"
+            triggers[row[0]][key] = {"definition": as_value(row[3])}
         self.logger.info("Extracted triggers from PostgreSQL.")
-        return triggers
+        return triggers.merged()
+
+    def extract_dependencies(self, cursor, schemas):
+        # Views depend on the relations their rewrite rule reads, SQL-body functions on the relations
+        # they use (plpgsql bodies are not tracked by pg_depend), triggers on their table and function
+        dependencies = SchemaGroups(schemas)
+        cursor.execute("""
+            SELECT DISTINCT vn.nspname, NULL, v.relname, tn.nspname, t.relname
+            FROM pg_rewrite r
+            JOIN pg_class v ON v.oid = r.ev_class
+            JOIN pg_namespace vn ON vn.oid = v.relnamespace
+            JOIN pg_depend d ON d.classid = 'pg_rewrite'::regclass AND d.objid = r.oid AND d.refclassid = 'pg_class'::regclass
+            JOIN pg_class t ON t.oid = d.refobjid AND t.oid <> v.oid
+            JOIN pg_namespace tn ON tn.oid = t.relnamespace
+            WHERE vn.nspname = ANY(%s::text[])
+            UNION
+            SELECT pn.nspname, NULL, p.proname, tn.nspname, t.relname
+            FROM pg_proc p
+            JOIN pg_namespace pn ON pn.oid = p.pronamespace
+            JOIN pg_depend d ON d.classid = 'pg_proc'::regclass AND d.objid = p.oid AND d.refclassid = 'pg_class'::regclass
+            JOIN pg_class t ON t.oid = d.refobjid
+            JOIN pg_namespace tn ON tn.oid = t.relnamespace
+            WHERE pn.nspname = ANY(%s::text[])
+            UNION
+            SELECT n.nspname, c.relname, tg.tgname, rn.nspname, ref.name
+            FROM pg_trigger tg
+            JOIN pg_class c ON c.oid = tg.tgrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            JOIN pg_proc f ON f.oid = tg.tgfoid
+            CROSS JOIN LATERAL (VALUES (n.oid, c.relname::text), (f.pronamespace, f.proname::text)) AS ref(nspoid, name)
+            JOIN pg_namespace rn ON rn.oid = ref.nspoid
+            WHERE NOT tg.tgisinternal AND n.nspname = ANY(%s::text[])
+        """, (list(schemas),) * 3)
+        for row in self.iter_rows(cursor):
+            key = f"{row[0]}.{row[1]}.{row[2]}" if row[1] else f"{row[0]}.{row[2]}"
+            dependencies[row[0]].setdefault(key, []).append(sys.intern(f"{row[3]}.{row[4]}"))
+        self.logger.info("Extracted dependencies from PostgreSQL.")
+        return dependencies.merged()
 
     def close(self):
+        self.close_pool()
         if self.conn:
             self.conn.close()
             self.logger.info("PostgreSQL connection closed.")
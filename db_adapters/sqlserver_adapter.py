@@ -1,246 +1,357 @@
+import sys
 import pyodbc
-from db_adapters.base_db_adapter import BaseDBAdapter
+from db_adapters.base_db_adapter import BaseDBAdapter, SchemaGroups
+from metadata_model import record_type
+
+Column = record_type(("column", "data_type", "max_length"))
+ConstraintColumn = record_type(("constraint_name", "column"))
+IndexColumn = record_type(("column", "index_type", "included"))
+# Filter rules of each sys.objects routine type
+ROUTINE_OBJECT_TYPES = {"P": "stored_procedures", "FN": "functions"}
 
 class SQLServerAdapter(BaseDBAdapter):
-    def __init__(self, config, logger):
-        self.config = config
-        self.logger = logger
-        self.conn = None
+    supports_delta = True
+    # HASHBYTES hashes the nvarchar definition as UTF-16LE; the hex string compares across servers
+    hash_expression = "CONVERT(varchar(64), HASHBYTES('SHA2_256', {}), 2)"
 
     def connect(self, dbconstr):
+        server = dbconstr.get("server")
+        database = dbconstr.get("database")
         try:
-            auth_type = dbconstr.get("auth_type", "sql").lower()
-            server = dbconstr["server"]
-            database = dbconstr["database"]
-            timeout = dbconstr.get("timeout", 30)
-
-            if auth_type == "windows":
-                conn_str = (
-                f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};"
-                f"DATABASE={database};Trusted_Connection=yes;Timeout={timeout};"
-                )
-            else:
-                username = dbconstr["username"]
-                password = dbconstr["password"]
-                conn_str = (
-                    f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};"
-                    f"DATABASE={database};UID={username};PWD={password};Timeout={timeout};"
-                )
-
-            self.conn = pyodbc.connect(conn_str, timeout=dbconstr.get("timeout", 30))
+            self.dbconstr = dbconstr
+            self.conn = self.open_connection(dbconstr)
             self.logger.info(f"Connected to SQL Server {server}-{database}")
             return self.conn
         except Exception as e:
             self.logger.exception(f"Database connection error {server}-{database}: {str(e)}")
             raise
 
-    def extract_metadata(self) -> dict:
-        cursor = self.conn.cursor()
-        metadata = {}
-        schemas = self.config["schemas_to_compare"]
-        object_types = self.config["compare_objects"]
+    def open_connection(self, dbconstr):
+        auth_type = dbconstr.get("auth_type", "sql").lower()
+        server = dbconstr["server"]
+        database = dbconstr["database"]
+        timeout = dbconstr.get("timeout", 30)
+
+        if auth_type == "windows":
+            conn_str = (
+                f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};"
+                f"DATABASE={database};Trusted_Connection=yes;Timeout={timeout};"
+            )
+        else:
+            username = dbconstr["username"]
+            password = dbconstr["password"]
+            conn_str = (
+                f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};"
+                f"DATABASE={database};UID={username};PWD={password};Timeout={timeout};"
+            )
 
+        return pyodbc.connect(conn_str, timeout=timeout)
+
+    def extraction_tasks(self, schemas: list[str], object_types: dict) -> list:
+        tasks = []
         if object_types.get("tables"):
-            metadata["tables"] = self.extract_tables(cursor, schemas)
+            tasks.append(("tables", self.extract_tables, ()))
         if object_types.get("views"):
-            metadata["views"] = self.extract_views(cursor, schemas)
+            tasks.append(("views", self.extract_views, ()))
         if object_types.get("stored_procedures"):
-            metadata["stored_procedures"] = self.extract_routines(cursor, schemas, "P")
+            tasks.append(("stored_procedures", self.extract_routines, ("P",)))
         if object_types.get("functions"):
-            metadata["functions"] = self.extract_routines(cursor, schemas,"FN")
+            tasks.append(("functions", self.extract_routines, ("FN",)))
         if object_types.get("constraints"):
-            metadata["constraints"] = self.extract_constraints(cursor, schemas)
+            tasks.append(("constraints", self.extract_constraints, ()))
         if object_types.get("indexes"):
-            metadata["indexes"] = self.extract_indexes(cursor, schemas)
+            tasks.append(("indexes", self.extract_indexes, ()))
         if object_types.get("triggers"):
-            metadata["triggers"] = self.extract_triggers(cursor, schemas)
+            tasks.append(("triggers", self.extract_triggers, ()))
+        if object_types.get("dependencies"):
+            tasks.append(("dependencies", self.extract_dependencies, ()))
 
         # ... continue for other types
 
-        return metadata
-
-    def extract_tables(self, cursor, schemas: list[str]) -> dict:
-        tables = {}
-        for schema in schemas:
-            query = f'''
-            SELECT t.name AS table_name, c.name AS column_name, c.column_id, ty.name AS data_type, c.max_length
-            FROM sys.tables t
-            JOIN sys.columns c ON t.object_id = c.object_id
-            JOIN sys.types ty ON c.user_type_id = ty.user_type_id
-            JOIN sys.schemas s ON t.schema_id = s.schema_id
-            WHERE s.name = ?
-            ORDER BY t.name, c.column_id'''
-          
-            cursor.execute(query, schema)
-            for row in cursor.fetchall():
-                tbl = f"{schema}.{row.table_name}"
-                if tbl not in tables:
-                    tables[tbl] = []
-                tables[tbl].append({
-                    "column": row.column_name,
-                    "data_type": row.data_type,
-                    "max_length": row.max_length
-                })
+        return tasks
+
+    def catalog_version(self, cursor, schemas: list[str]):
+        # modify_date also moves when an index on a table is created or altered; the count and
+        # checksum catch dropped objects, which max(modify_date) alone would miss
+        query = f'''
+        SELECT 
+            COUNT(*) AS object_count,
+            MAX(o.modify_date) AS last_modified,
+            CHECKSUM_AGG(CHECKSUM(o.object_id, o.modify_date)) AS objects_checksum
+        FROM sys.objects o
+        JOIN sys.schemas s ON o.schema_id = s.schema_id
+        WHERE s.name IN ({self.placeholders(schemas)})'''
+
+        cursor.execute(query, *schemas)
+        row = cursor.fetchall()[0]
+        return f"{row.object_count}|{row.last_modified}|{row.objects_checksum}"
+
+    def delta_watermark(self, cursor, schemas: list[str]):
+        query = f'''
+        SELECT CONVERT(varchar(33), MAX(o.modify_date), 126) AS watermark
+        FROM sys.objects o
+        JOIN sys.schemas s ON o.schema_id = s.schema_id
+        WHERE s.name IN ({self.placeholders(schemas)})'''
+
+        cursor.execute(query, *schemas)
+        return cursor.fetchall()[0].watermark
+
+    def delta_scope(self, cursor, schemas: list[str], watermark):
+        # Lists the top-level objects and triggers that still exist, plus the top-level objects
+        # modified since the watermark; a modified child (trigger, constraint) marks its table as changed
+        query = f'''
+        SELECT 
+            s.name AS schema_name,
+            COALESCE(p.name, o.name) AS parent_name,
+            CASE WHEN o.type = 'TR' THEN o.name END AS trigger_name,
+            CASE WHEN o.modify_date >= CAST(? AS datetime2) THEN 1 ELSE 0 END AS is_changed
+        FROM sys.objects o
+        LEFT JOIN sys.objects p ON p.object_id = NULLIF(o.parent_object_id, 0)
+        JOIN sys.schemas s ON o.schema_id = s.schema_id
+        WHERE s.name IN ({self.placeholders(schemas)})
+            AND (o.parent_object_id = 0 OR o.type = 'TR' OR o.modify_date >= CAST(? AS datetime2))'''
+
+        cursor.execute(query, watermark, *schemas, watermark)
+        changed, live = set(), set()
+        for row in self.iter_rows(cursor):
+            parent = f"{row.schema_name}.{row.parent_name}"
+            live.add(f"{parent}.{row.trigger_name}" if row.trigger_name is not None else parent)
+            if row.is_changed:
+                changed.add(parent)
+        return changed, live
+
+    def _changed_since_clause(self, object_id_column, since):
+        if since is None:
+            return "", ()
+        clause = (
+            f"AND {object_id_column} IN (SELECT COALESCE(NULLIF(x.parent_object_id, 0), x.object_id) "
+            f"FROM sys.objects x WHERE x.modify_date >= CAST(? AS datetime2))"
+        )
+        return clause, (since,)
+
+    def extract_tables(self, cursor, schemas: list[str], since=None) -> dict:
+        tables = SchemaGroups(schemas)
+        since_clause, since_params = self._changed_since_clause("t.object_id", since)
+        filter_clause, filter_params = self.name_filter("tables", "t.name")
+        query = f'''
+        SELECT s.name AS schema_name, t.name AS table_name, c.name AS column_name, c.column_id, ty.name AS data_type, c.max_length
+        FROM sys.tables t
+        JOIN sys.columns c ON t.object_id = c.object_id
+        JOIN sys.types ty ON c.user_type_id = ty.user_type_id
+        JOIN sys.schemas s ON t.schema_id = s.schema_id
+        WHERE s.name IN ({self.placeholders(schemas)}) {since_clause}{filter_clause}
+        ORDER BY s.name, t.name, c.column_id'''
+
+        cursor.execute(query, *schemas, *since_params, *filter_params)
+        for row in self.iter_rows(cursor):
+            schema = tables.schema(row.schema_name)
+            tables[schema].setdefault(f"{schema}.{row.table_name}", []).append(
+                Column(row.column_name, row.data_type, row.max_length)
+            )
         self.logger.info(f"Extracted tables for schemas: {schemas}")
-        return tables
-
-    def extract_views(self, cursor, schemas: list[str]) -> dict:
-        views = {}
-        for schema in schemas:
-            query = '''
-            SELECT s.name AS schema_name, v.name AS view_name, m.definition
-            FROM sys.views v
-            JOIN sys.sql_modules m ON v.object_id = m.object_id
-            JOIN sys.schemas s ON v.schema_id = s.schema_id
-            WHERE s.name = ?'''
-
-            cursor.execute(query, schema)
-            for row in cursor.fetchall():
-                views[f"{row.schema_name}.{row.view_name}"] = row.definition
+        return tables.merged()
+
+    def extract_views(self, cursor, schemas: list[str], since=None, keys=None) -> dict:
+        views = SchemaGroups(schemas)
+        since_clause, since_params = self._changed_since_clause("v.object_id", since)
+        filter_clause, filter_params = self.name_filter("views", "v.name")
+        definition, as_value = self.definition_column("m.definition", keys)
+        key_clause, key_params = self.key_filter("CONCAT(s.name, '.', v.name)", keys)
+        query = f'''
+        SELECT s.name AS schema_name, v.name AS view_name, {definition} AS definition
+        FROM sys.views v
+        JOIN sys.sql_modules m ON v.object_id = m.object_id
+        JOIN sys.schemas s ON v.schema_id = s.schema_id
+        WHERE s.name IN ({self.placeholders(schemas)}) {since_clause}{filter_clause}{key_clause}'''
+
+        cursor.execute(query, *schemas, *since_params, *filter_params, *key_params)
+        for row in self.iter_rows(cursor):
+            views[row.schema_name][f"{row.schema_name}.{row.view_name}"] = as_value(row.definition)
         self.logger.info(f"Extracted views for schemas: {schemas}")
-        return views
+        return views.merged()
 
-    def extract_constraints(self, cursor, schemas: list[str]) -> dict:
-        constraints = {
+    def extract_constraints(self, cursor, schemas: list[str], since=None) -> dict:
+        constraints = SchemaGroups(schemas, lambda: {
             "primary_keys": {},
             "foreign_keys": {},
             "unique_constraints": {}
-        }
-
-        for schema in schemas:
-            # Primary Keys and Unique Constraints
-            query_keys = '''
-            SELECT 
-                s.name AS schema_name,
-                t.name AS table_name,
-                kc.name AS constraint_name,
-                kc.type AS constraint_type,
-                c.name AS column_name
-            FROM sys.key_constraints kc
-            JOIN sys.tables t ON kc.parent_object_id = t.object_id
-            JOIN sys.schemas s ON t.schema_id = s.schema_id
-            JOIN sys.index_columns ic ON kc.unique_index_id = ic.index_id AND kc.parent_object_id = ic.object_id
-            JOIN sys.columns c ON ic.column_id = c.column_id AND c.object_id = t.object_id
-            WHERE s.name = ?
-            '''
-
-            cursor.execute(query_keys, schema)
-            for row in cursor.fetchall():
-                full_table = f"{schema}.{row.table_name}"
-                entry = {
-                    "constraint_name": row.constraint_name,
-                    "column": row.column_name
-                }
-                if row.constraint_type == "PK":
-                    constraints["primary_keys"].setdefault(full_table, []).append(entry)
-                elif row.constraint_type == "UQ":
-                    constraints["unique_constraints"].setdefault(full_table, []).append(entry)
-
-            # Foreign Keys
-            query_fk = '''
-            SELECT 
-                s.name AS schema_name,
-                t.name AS table_name,
-                fk.name AS fk_name,
-                c.name AS column_name
-            FROM sys.foreign_keys fk
-            JOIN sys.foreign_key_columns fkc ON fk.object_id = fkc.constraint_object_id
-            JOIN sys.tables t ON fk.parent_object_id = t.object_id
-            JOIN sys.schemas s ON t.schema_id = s.schema_id
-            JOIN sys.columns c ON fkc.parent_column_id = c.column_id AND c.object_id = t.object_id
-            WHERE s.name = ?
-            '''
-
-            cursor.execute(query_fk, schema)
-            for row in cursor.fetchall():
-                full_table = f"{schema}.{row.table_name}"
-                entry = {
-                    "constraint_name": row.fk_name,
-                    "column": row.column_name
-                }
-                constraints["foreign_keys"].setdefault(full_table, []).append(entry)
+        })
+        since_clause, since_params = self._changed_since_clause("t.object_id", since)
+        filter_clause, filter_params = self.name_filter("constraints", None, "t.name")
+
+        # Primary Keys and Unique Constraints
+        query_keys = f'''
+        SELECT 
+            s.name AS schema_name,
+            t.name AS table_name,
+            kc.name AS constraint_name,
+            kc.type AS constraint_type,
+            c.name AS column_name
+        FROM sys.key_constraints kc
+        JOIN sys.tables t ON kc.parent_object_id = t.object_id
+        JOIN sys.schemas s ON t.schema_id = s.schema_id
+        JOIN sys.index_columns ic ON kc.unique_index_id = ic.index_id AND kc.parent_object_id = ic.object_id
+        JOIN sys.columns c ON ic.column_id = c.column_id AND c.object_id = t.object_id
+        WHERE s.name IN ({self.placeholders(schemas)}) {since_clause}{filter_clause}
+        '''
+
+        cursor.execute(query_keys, *schemas, *since_params, *filter_params)
+        for row in self.iter_rows(cursor):
+            schema = constraints.schema(row.schema_name)
+            full_table = f"{schema}.{row.table_name}"
+            entry = ConstraintColumn(row.constraint_name, row.column_name)
+            if row.constraint_type == "PK":
+                constraints[schema]["primary_keys"].setdefault(full_table, []).append(entry)
+            elif row.constraint_type == "UQ":
+                constraints[schema]["unique_constraints"].setdefault(full_table, []).append(entry)
+
+        # Foreign Keys
+        query_fk = f'''
+        SELECT 
+            s.name AS schema_name,
+            t.name AS table_name,
+            fk.name AS fk_name,
+            c.name AS column_name
+        FROM sys.foreign_keys fk
+        JOIN sys.foreign_key_columns fkc ON fk.object_id = fkc.constraint_object_id
+        JOIN sys.tables t ON fk.parent_object_id = t.object_id
+        JOIN sys.schemas s ON t.schema_id = s.schema_id
+        JOIN sys.columns c ON fkc.parent_column_id = c.column_id AND c.object_id = t.object_id
+        WHERE s.name IN ({self.placeholders(schemas)}) {since_clause}{filter_clause}
+        '''
+
+        cursor.execute(query_fk, *schemas, *since_params, *filter_params)
+        for row in self.iter_rows(cursor):
+            schema = constraints.schema(row.schema_name)
+            full_table = f"{schema}.{row.table_name}"
+            entry = ConstraintColumn(row.fk_name, row.column_name)
+            constraints[schema]["foreign_keys"].setdefault(full_table, []).append(entry)
 
         self.logger.info(f"Extracted constraints for schemas: {schemas}")
-        return constraints
-
-    def extract_indexes(self, cursor, schemas: list[str]) -> dict:
-        indexes = {}
-        for schema in schemas:
-            query = '''
-            SELECT 
-                s.name AS schema_name,
-                t.name AS table_name,
-                i.name AS index_name,
-                i.type_desc AS index_type,
-                c.name AS column_name,
-                ic.is_included_column
-            FROM sys.indexes i
-            JOIN sys.index_columns ic ON i.object_id = ic.object_id AND i.index_id = ic.index_id
-            JOIN sys.columns c ON ic.column_id = c.column_id AND ic.object_id = c.object_id
-            JOIN sys.tables t ON i.object_id = t.object_id
-            JOIN sys.schemas s ON t.schema_id = s.schema_id
-            WHERE s.name = ? AND i.is_primary_key = 0 AND i.is_unique_constraint = 0
-            ORDER BY t.name, i.name, ic.key_ordinal
-            '''
-            cursor.execute(query, schema)
-            for row in cursor.fetchall():
-                full_table = f"{schema}.{row.table_name}"
-                key = f"{full_table}.{row.index_name}"
-                entry = {
-                    "column": row.column_name,
-                    "index_type": row.index_type,
-                    "included": bool(row.is_included_column)
-                }
-                indexes.setdefault(key, []).append(entry)
+        return constraints.merged(nested=True)
+
+    def extract_indexes(self, cursor, schemas: list[str], since=None) -> dict:
+        indexes = SchemaGroups(schemas)
+        since_clause, since_params = self._changed_since_clause("t.object_id", since)
+        filter_clause, filter_params = self.name_filter("indexes", "i.name", "t.name")
+        query = f'''
+        SELECT 
+            s.name AS schema_name,
+            t.name AS table_name,
+            i.name AS index_name,
+            i.type_desc AS index_type,
+            c.name AS column_name,
+            ic.is_included_column
+        FROM sys.indexes i
+        JOIN sys.index_columns ic ON i.object_id = ic.object_id AND i.index_id = ic.index_id
+        JOIN sys.columns c ON ic.column_id = c.column_id AND ic.object_id = c.object_id
+        JOIN sys.tables t ON i.object_id = t.object_id
+        JOIN sys.schemas s ON t.schema_id = s.schema_id
+        WHERE s.name IN ({self.placeholders(schemas)}) AND i.is_primary_key = 0 AND i.is_unique_constraint = 0 {since_clause}{filter_clause}
+        ORDER BY s.name, t.name, i.name, ic.key_ordinal
+        '''
+        cursor.execute(query, *schemas, *since_params, *filter_params)
+        for row in self.iter_rows(cursor):
+            schema = indexes.schema(row.schema_name)
+            key = f"{schema}.{row.table_name}.{row.index_name}"
+            entry = IndexColumn(row.column_name, row.index_type, bool(row.is_included_column))
+            indexes[schema].setdefault(key, []).append(entry)
 
         self.logger.info(f"Extracted indexes for schemas: {schemas}")
-        return indexes
+        return indexes.merged()
 
-    def extract_routines(self, cursor, schemas: list[str], routine_type) -> dict:
-        routines = {}
+    def extract_routines(self, cursor, schemas: list[str], routine_type, since=None, keys=None) -> dict:
+        routines = SchemaGroups(schemas)
         type_clause = "AND o.type = ?"
-        for schema in schemas:
-            query = f'''
-            SELECT s.name AS schema_name, o.name AS routine_name, m.definition
-            FROM sys.objects o
-            JOIN sys.sql_modules m ON o.object_id = m.object_id
-            JOIN sys.schemas s ON o.schema_id = s.schema_id
-            WHERE s.name = ? {type_clause}'''
-
-            cursor.execute(query, schema, routine_type)
-            for row in cursor.fetchall():
-                routines[f"{row.schema_name}.{row.routine_name}"] = row.definition
+        since_clause, since_params = self._changed_since_clause("o.object_id", since)
+        filter_clause, filter_params = self.name_filter(ROUTINE_OBJECT_TYPES[routine_type], "o.name")
+        definition, as_value = self.definition_column("m.definition", keys)
+        key_clause, key_params = self.key_filter("CONCAT(s.name, '.', o.name)", keys)
+        query = f'''
+        SELECT s.name AS schema_name, o.name AS routine_name, {definition} AS definition
+        FROM sys.objects o
+        JOIN sys.sql_modules m ON o.object_id = m.object_id
+        JOIN sys.schemas s ON o.schema_id = s.schema_id
+        WHERE s.name IN ({self.placeholders(schemas)}) {type_clause} {since_clause}{filter_clause}{key_clause}'''
+
+        cursor.execute(query, *schemas, routine_type, *since_params, *filter_params, *key_params)
+        for row in self.iter_rows(cursor):
+            routines[row.schema_name][f"{row.schema_name}.{row.routine_name}"] = as_value(row.definition)
         self.logger.info(f"Extracted routines for schemas: {schemas}")
-        return routines
-
-    def extract_triggers(self, cursor, schemas: list[str]) -> dict:
-        triggers = {}
-        for schema in schemas:
-            query = '''
-            SELECT 
-                s.name AS schema_name,
-                t.name AS table_name,
-                tr.name AS trigger_name,
-                m.definition,
-                tr.is_disabled
-            FROM sys.triggers tr
-            JOIN sys.tables t ON tr.parent_id = t.object_id
-            JOIN sys.schemas s ON t.schema_id = s.schema_id
-            JOIN sys.sql_modules m ON tr.object_id = m.object_id
-            WHERE s.name = ?
-            '''
-            cursor.execute(query, schema)
-            for row in cursor.fetchall():
-                key = f"{schema}.{row.table_name}.{row.trigger_name}"
-                triggers[key] = {
-                    "definition": row.definition,
-                    "disabled": bool(row.is_disabled)
-                }
+        return routines.merged()
+
+    def extract_triggers(self, cursor, schemas: list[str], since=None, keys=None) -> dict:
+        triggers = SchemaGroups(schemas)
+        since_clause, since_params = self._changed_since_clause("t.object_id", since)
+        filter_clause, filter_params = self.name_filter("triggers", "tr.name", "t.name")
+        definition, as_value = self.definition_column("m.definition", keys)
+        key_clause, key_params = self.key_filter("CONCAT(s.name, '.', t.name, '.', tr.name)", keys)
+        query = f'''
+        SELECT 
+            s.name AS schema_name,
+            t.name AS table_name,
+            tr.name AS trigger_name,
+            {definition} AS definition,
+            tr.is_disabled
+        FROM sys.triggers tr
+        JOIN sys.tables t ON tr.parent_id = t.object_id
+        JOIN sys.schemas s ON t.schema_id = s.schema_id
+        JOIN sys.sql_modules m ON tr.object_id = m.object_id
+        WHERE s.name IN ({self.placeholders(schemas)}) {since_clause}{filter_clause}{key_clause}
+        '''
+        cursor.execute(query, *schemas, *since_params, *filter_params, *key_params)
+        for row in self.iter_rows(cursor):
+            schema = triggers.schema(row.schema_name)
+            key = f"{schema}.{row.table_name}.{row.trigger_name}"
+            triggers[schema][key] = {
+                "definition": as_value(row.definition),
+                "disabled": bool(row.is_disabled)
+            }
 
         self.logger.info(f"Extracted triggers for schemas: {schemas}")
-        return triggers
+        return triggers.merged()
+
+    def extract_dependencies(self, cursor, schemas: list[str], since=None) -> dict:
+        # One row per edge: expression dependencies of views, procedures, functions and triggers,
+        # plus every trigger's dependency on its parent table
+        dependencies = SchemaGroups(schemas)
+        since_clause, since_params = self._changed_since_clause("COALESCE(NULLIF(o.parent_object_id, 0), o.object_id)", since)
+        parent_since_clause, parent_since_params = self._changed_since_clause("t.object_id", since)
+        query = f'''
+        SELECT 
+            s.name AS schema_name,
+            p.name AS parent_name,
+            o.name AS object_name,
+            COALESCE(rs.name, d.referenced_schema_name, s.name) AS referenced_schema,
+            COALESCE(r.name, d.referenced_entity_name) AS referenced_name
+        FROM sys.sql_expression_dependencies d
+        JOIN sys.objects o ON d.referencing_id = o.object_id
+        JOIN sys.schemas s ON o.schema_id = s.schema_id
+        LEFT JOIN sys.objects p ON o.type = 'TR' AND p.object_id = o.parent_object_id
+        LEFT JOIN sys.objects r ON d.referenced_id = r.object_id
+        LEFT JOIN sys.schemas rs ON r.schema_id = rs.schema_id
+        WHERE s.name IN ({self.placeholders(schemas)}) AND d.referencing_class = 1
+            AND d.referenced_server_name IS NULL AND d.referenced_database_name IS NULL
+            AND o.type IN ('V', 'P', 'FN', 'TR') {since_clause}
+        UNION
+        SELECT s.name, t.name, tr.name, s.name, t.name
+        FROM sys.triggers tr
+        JOIN sys.tables t ON tr.parent_id = t.object_id
+        JOIN sys.schemas s ON t.schema_id = s.schema_id
+        WHERE s.name IN ({self.placeholders(schemas)}) {parent_since_clause}
+        '''
+        cursor.execute(query, *schemas, *since_params, *schemas, *parent_since_params)
+        for row in self.iter_rows(cursor):
+            schema = dependencies.schema(row.schema_name)
+            key = f"{schema}.{row.parent_name}.{row.object_name}" if row.parent_name else f"{schema}.{row.object_name}"
+            referenced = sys.intern(f"{dependencies.schema(row.referenced_schema)}.{row.referenced_name}")
+            dependencies[schema].setdefault(key, []).append(referenced)
+
+        self.logger.info(f"Extracted dependencies for schemas: {schemas}")
+        return dependencies.merged()
 
     def close(self):
+        self.close_pool()
         if self.conn:
             self.conn.close()
             self.logger.info("SQL Server connection closed.")
@@ -1,15 +1,15 @@
-from db_adapters.sqlserver_adapter import SQLServerAdapter
-from db_adapters.mysql_adapter import MySQLAdapter
-from db_adapters.postgresql_adapter import PostgreSQLAdapter
-
-
 def get_db_adapter(db_type: str, config, logger):
+    # Drivers are imported on demand, so offline commands (e.g. comparing snapshots)
+    # work without any database driver installed
     db_type = db_type.lower()
     if db_type == "sqlserver":
+        from db_adapters.sqlserver_adapter import SQLServerAdapter
         return SQLServerAdapter(config, logger)
     elif db_type == "mysql":
+        from db_adapters.mysql_adapter import MySQLAdapter
         return MySQLAdapter(config, logger)
     elif db_type == "postgresql":
+        from db_adapters.postgresql_adapter import PostgreSQLAdapter
         return PostgreSQLAdapter(config, logger)
     else:
         raise ValueError(f"Unsupported database type: {db_type}")
\ No newline at end of file
@@ -0,0 +1,43 @@
+from collections import deque
+
+# Metadata key the adapters store the dependency graph under: {referencing_key: [referenced_key, ...]}
+DEPENDENCY_KEY = "dependencies"
+
+def reverse_graph(*graphs):
+    """
+    {referenced: [referencing, ...]} over the edges of every graph, keys lowercased: names in module
+    text need not match the catalog's spelling, and the graphs of both sides are merged.
+    """
+    dependents = {}
+    seen = set()
+    for graph in graphs:
+        for key, referenced in (graph or {}).items():
+            referencing = key.lower()
+            for target in referenced:
+                edge = (target.lower(), referencing)
+                if edge not in seen:
+                    seen.add(edge)
+                    dependents.setdefault(edge[0], []).append(referencing)
+    return dependents
+
+def affected_objects(changed, dependents):
+    """
+    Objects that transitively depend on any of the `changed` keys, as {key: (changed_key, depth)}:
+    the nearest changed object each one depends on, and how many edges away it is. Keys are
+    lowercased; the changed objects themselves are not included.
+    """
+    roots = {}
+    queue = deque()
+    for key in changed:
+        key = key.lower()
+        if key not in roots:
+            roots[key] = (key, 0)
+            queue.append(key)
+    while queue:
+        key = queue.popleft()
+        root, depth = roots[key]
+        for dependent in dependents.get(key, ()):
+            if dependent not in roots:
+                roots[dependent] = (root, depth + 1)
+                queue.append(dependent)
+    return {key: value for key, value in roots.items() if value[1]}
@@ -0,0 +1,160 @@
+import time
+import profiler
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor, wait, ALL_COMPLETED, FIRST_EXCEPTION
+from comparator import DEFINITION_TYPES
+from metadata_model import is_deferred
+
+
+def extract_side(label, adapter, conn_cfg, logger):
+    start = time.perf_counter()
+    with profiler.phase(f"extract.{label}.connect"):
+        adapter.connect(conn_cfg)
+    connected = time.perf_counter()
+    with profiler.phase(f"extract.{label}.metadata"):
+        metadata = adapter.extract_metadata()
+    finished = time.perf_counter()
+    logger.info(
+        f"[{label}] connect: {connected - start:.2f}s, "
+        f"extract: {finished - connected:.2f}s, total: {finished - start:.2f}s"
+    )
+    return metadata
+
+
+def extract_sequentially(jobs, logger):
+    return {label: extract_side(label, adapter, conn_cfg, logger) for label, (adapter, conn_cfg) in jobs.items()}
+
+
+def extract_concurrently(jobs, logger, max_workers=None, fail_fast=True):
+    """
+    Connect and extract every side in `jobs` ({label: (adapter, conn_cfg)}) on its own thread.
+    The work is network-bound, so threads overlap the catalog round trips of all servers.
+    If any side fails, sides that have not started yet are cancelled, the catalog queries of sides
+    already running are aborted (BaseDBAdapter.abort) and the first error is re-raised once their
+    threads have returned. With fail_fast=False every side runs to completion and failed sides are
+    logged and left out of the result.
+    """
+    start = time.perf_counter()
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers or len(jobs), thread_name_prefix="extract") as executor:
+        futures = {
+            executor.submit(extract_side, label, adapter, conn_cfg, logger): label
+            for label, (adapter, conn_cfg) in jobs.items()
+        }
+        done, pending = wait(futures, return_when=FIRST_EXCEPTION if fail_fast else ALL_COMPLETED)
+
+        failed = [f for f in done if f.exception() is not None]
+        if failed and not fail_fast:
+            for future in failed:
+                logger.error(f"[{futures[future]}] metadata extraction failed: {future.exception()}")
+        elif failed:
+            for future in pending:
+                if not future.cancel():
+                    jobs[futures[future]][0].abort()
+            wait(pending)
+            error = failed[0].exception()
+            logger.error(f"[{futures[failed[0]]}] metadata extraction failed; cancelled remaining sides.")
+            raise error
+
+        for future, label in futures.items():
+            if future.exception() is None:
+                results[label] = future.result()
+
+    logger.info(f"Concurrent extraction of {list(jobs)} completed in {time.perf_counter() - start:.2f}s")
+    return results
+
+
+def _definition(value):
+    return value.get("definition") if isinstance(value, Mapping) else value
+
+
+def _with_definition(value, definition):
+    return {**value, "definition": definition} if isinstance(value, Mapping) else definition
+
+
+def deferred_definition_keys(extracted, source_label="source", include_unmatched=False):
+    """
+    The objects whose definitions phase two of a deferred extraction must fetch, as
+    {label: {obj_type: set of keys}}. Every side is compared with `source_label`: objects whose hash
+    placeholders are equal on both sides are never fetched, objects present on one side only are
+    fetched when include_unmatched (rename detection compares their text).
+    """
+    keys = {label: {} for label in extracted}
+    source = extracted[source_label]
+
+    def add(label, obj_type, key, value):
+        if is_deferred(value):
+            keys[label].setdefault(obj_type, set()).add(key)
+
+    for label, metadata in extracted.items():
+        if label == source_label:
+            continue
+        for obj_type in DEFINITION_TYPES:
+            src_objs = source.get(obj_type, {})
+            dst_objs = metadata.get(obj_type, {})
+            for key, src_value in src_objs.items():
+                if key in dst_objs:
+                    if _definition(src_value) != _definition(dst_objs[key]):
+                        add(source_label, obj_type, key, src_value)
+                        add(label, obj_type, key, dst_objs[key])
+                elif include_unmatched:
+                    add(source_label, obj_type, key, src_value)
+            if include_unmatched:
+                for key, dst_value in dst_objs.items():
+                    if key not in src_objs:
+                        add(label, obj_type, key, dst_value)
+    return keys
+
+
+def fetch_deferred_definitions(jobs, extracted, logger, source_label="source", include_unmatched=False, fail_fast=True):
+    """
+    Phase two of a deferred extraction: fetch the definitions whose server-side hashes differ between
+    the source and each other side, every side on its own thread, and patch them into `extracted`.
+    With fail_fast=False a side that fails is logged and dropped from `extracted`.
+    Sides whose hash matches the source's take the source's fetched text rather than fetching it again.
+    """
+    start = time.perf_counter()
+    keys = deferred_definition_keys(extracted, source_label, include_unmatched)
+    deferred = sum(
+        is_deferred(value)
+        for metadata in extracted.values() for obj_type in DEFINITION_TYPES for value in metadata.get(obj_type, {}).values()
+    )
+    requested = {label: by_type for label, by_type in keys.items() if by_type}
+    if not requested:
+        logger.info(f"All {deferred} deferred definitions have matching hashes; no definition text fetched.")
+        return extracted
+
+    source_placeholders = {
+        obj_type: {key: _definition(extracted[source_label][obj_type][key]) for key in object_keys}
+        for obj_type, object_keys in requested.get(source_label, {}).items()
+    }
+    with ThreadPoolExecutor(max_workers=len(requested), thread_name_prefix="definitions") as executor:
+        futures = {label: executor.submit(jobs[label][0].fetch_definitions, by_type) for label, by_type in requested.items()}
+        for label, future in futures.items():
+            try:
+                fetched = future.result()
+            except Exception as e:
+                if fail_fast:
+                    raise
+                logger.error(f"[{label}] fetching deferred definitions failed: {e}")
+                extracted.pop(label, None)
+                continue
+            for obj_type, values in fetched.items():
+                extracted[label][obj_type].update(values)
+
+    source = extracted.get(source_label)
+    for obj_type, placeholders in source_placeholders.items() if source is not None else ():
+        for label, metadata in extracted.items():
+            objects = metadata.get(obj_type, {})
+            if label == source_label or not objects:
+                continue
+            for key, placeholder in placeholders.items():
+                if key in objects and _definition(objects[key]) == placeholder and key in source.get(obj_type, {}):
+                    objects[key] = _with_definition(objects[key], _definition(source[obj_type][key]))
+
+    fetched_count = sum(len(object_keys) for by_type in requested.values() for object_keys in by_type.values())
+    logger.info(
+        f"Fetched {fetched_count} of {deferred} deferred definitions whose hashes differ "
+        f"in {time.perf_counter() - start:.2f}s"
+    )
+    return extracted
@@ -1,66 +1,293 @@
 from config_loader import load_config
 from logger import setup_logger
 from db_factory import get_db_adapter
-from comparator import compare_metadata
-from report_generator import generate_html_report, generate_pdf_report
+from comparator import compare_metadata, fingerprint_metadata
+from report_generator import configure_templates, generate_html_report, generate_jsonl_report, generate_lazy_html_report, generate_pdf_report, generate_summary_report, summarize_diff
+from extraction import extract_concurrently, extract_sequentially, fetch_deferred_definitions
+from snapshot import write_snapshot, read_snapshot
+from datetime import datetime
+import argparse
 import os
+import re
+import profiler
 
-def main():
-    logger = setup_logger()
-    config = load_config()
-    logger.info("Starting DB schema comparison...")
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare database schemas and generate diff reports.")
+    parser.add_argument("--profile", action="store_true", help="Write a JSON run profile even if profiling is disabled in the config.")
+    parser.add_argument(
+        "--python-profiler", choices=["cprofile", "pyinstrument"],
+        help="Also profile the run with cProfile or pyinstrument; the output is written next to the JSON profile."
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    snapshot_parser = subparsers.add_parser("snapshot", help="Extract one side's metadata into a snapshot file.")
+    snapshot_parser.add_argument("side", choices=["source", "destination"], help="Connection from the active_db config to extract.")
+    snapshot_parser.add_argument("output", help="Path of the snapshot file to write.")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two snapshot files without connecting to any database.")
+    compare_parser.add_argument("source", help="Source snapshot file.")
+    compare_parser.add_argument("destination", help="Destination snapshot file.")
+
+    return parser.parse_args(argv)
+
+def get_db_config(config, logger):
+    active_db = config.get("active_db")
+    db_config = config.get(active_db)
+    if not db_config:
+        raise ValueError(f"Missing configuration for active_db: {active_db}")
+
+    logger.info(f"Using database type: {active_db}")
+    return active_db, db_config
+
+def report_path_for(path, suffix=None):
+    if not suffix:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}_{suffix}{ext}"
+
+def write_reports(diff_report, config, logger, src_info, dst_info, suffix=None):
+    report_formats = config.get("output", {}).get("formats", ["html"])
+    written = {}
+
+    if "html" in report_formats:
+        report_path = report_path_for(config["output"]["html_report"], suffix)
+        os.makedirs(os.path.dirname(report_path), exist_ok=True)
+        with profiler.phase("report.html"):
+            if config["output"].get("html_mode", "inline") == "lazy":
+                generate_lazy_html_report(
+                    diff_report, report_path, logger, src_info, dst_info,
+                    page_size=config["output"].get("lazy_page_size", 500),
+                    shard_bytes=config["output"].get("lazy_shard_bytes", 262144)
+                )
+            else:
+                generate_html_report(
+                    diff_report, report_path, logger, src_info, dst_info,
+                    streaming=config["output"].get("stream_html", True)
+                )
+        written["html"] = report_path
+
+    if "pdf" in report_formats:
+        report_path = report_path_for(config["output"]["pdf_report"], suffix)
+        os.makedirs(os.path.dirname(report_path), exist_ok=True)
+        with profiler.phase("report.pdf"):
+            generate_pdf_report(diff_report, report_path, logger, src_info, dst_info, config.get("pdf"))
+        written["pdf"] = report_path
+
+    if "jsonl" in report_formats:
+        report_path = report_path_for(config["output"].get("jsonl_report", "./reports/schema_diff_report.jsonl"), suffix)
+        os.makedirs(os.path.dirname(report_path), exist_ok=True)
+        with profiler.phase("report.jsonl"):
+            jsonl_path = generate_jsonl_report(diff_report, report_path, logger, config["output"].get("jsonl_compression"))
+        if jsonl_path:
+            written["jsonl"] = jsonl_path
+
+    logger.info(f"Schema diff completed. Report saved to: {report_formats}")
+    return written
+
+def rename_detection(config):
+    return config.get("comparison", {}).get("rename_detection", False)
+
+def defer_definitions(config, adapters):
+    """Switch `adapters` to two-phase definition extraction when configured; True if any was switched."""
+    if not config.get("extraction", {}).get("defer_definitions", False):
+        return False
+    for adapter in adapters:
+        adapter.defer_definitions = True
+    return any(adapter.hash_expression for adapter in adapters)
+
+def run_live(config, logger):
+    active_db, db_config = get_db_config(config, logger)
+
+    src_conn_cfg = db_config["source"]
+    dst_conn_cfg = db_config["destination"]
+    schemas = src_conn_cfg.get("schemas", [])
+
+    src_info = {
+        "server": src_conn_cfg["server"],
+        "database": src_conn_cfg["database"]
+    }
+    dst_info = {
+        "server": dst_conn_cfg["server"],
+        "database": dst_conn_cfg["database"]
+    }
+
+    # Inject schema list into each adapter's config for metadata extraction
+    src_adapter = get_db_adapter(active_db, {**config, "schemas_to_compare": schemas}, logger)
+    dst_adapter = get_db_adapter(active_db, {**config, "schemas_to_compare": schemas}, logger)
+    defer = defer_definitions(config, [src_adapter, dst_adapter])
 
     try:
-        active_db = config.get("active_db")
-        db_config = config.get(active_db)
-        if not db_config:
-            raise ValueError(f"Missing configuration for active_db: {active_db}")
-        
-        logger.info(f"Using database type: {active_db}")
-
-        src_conn_cfg = db_config["source"]
-        dst_conn_cfg = db_config["destination"]
-        schemas = src_conn_cfg.get("schemas", [])
-
-        src_info = {
-            "server": src_conn_cfg["server"],
-            "database": src_conn_cfg["database"]
-        }
-        dst_info = {
-            "server": dst_conn_cfg["server"],
-            "database": dst_conn_cfg["database"]
+        jobs = {
+            "source": (src_adapter, src_conn_cfg),
+            "destination": (dst_adapter, dst_conn_cfg)
         }
+        if config.get("extraction", {}).get("concurrent", True):
+            extracted = extract_concurrently(jobs, logger)
+        else:
+            extracted = extract_sequentially(jobs, logger)
+        if defer:
+            with profiler.phase("extract.definitions"):
+                fetch_deferred_definitions(jobs, extracted, logger, include_unmatched=rename_detection(config))
+    finally:
+        src_adapter.close()
+        dst_adapter.close()
 
-        # Inject schema list into each adapter's config for metadata extraction
-        src_adapter = get_db_adapter(active_db, {**config, "schemas_to_compare": schemas}, logger)
-        dst_adapter = get_db_adapter(active_db, {**config, "schemas_to_compare": schemas}, logger)
+    diff_report = compare_metadata(extracted["source"], extracted["destination"], config, logger)
+    write_reports(diff_report, config, logger, src_info, dst_info)
 
-        src_adapter.connect(src_conn_cfg)
-        dst_adapter.connect(dst_conn_cfg)
+def destination_label(conn_cfg):
+    label = conn_cfg.get("name") or f"{conn_cfg['server']}_{conn_cfg['database']}"
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", label)
 
-        src_meta = src_adapter.extract_metadata()
-        dst_meta = dst_adapter.extract_metadata()
+def run_fanout(config, logger):
+    """
+    Compare one source against every entry of the active_db "destinations" list: the source is
+    extracted once, destinations concurrently on extraction.fanout_workers threads. Writes one report
+    set per destination plus a summary matrix; a failing destination does not stop the others.
+    """
+    active_db, db_config = get_db_config(config, logger)
 
-        diff_report = compare_metadata(src_meta, dst_meta, config, logger)
+    src_conn_cfg = db_config["source"]
+    schemas = src_conn_cfg.get("schemas", [])
+    src_info = {"server": src_conn_cfg["server"], "database": src_conn_cfg["database"]}
 
-        report_formats = config.get("output", {}).get("formats", ["html"])
+    jobs = {"source": (get_db_adapter(active_db, {**config, "schemas_to_compare": schemas}, logger), src_conn_cfg)}
+    for dst_conn_cfg in db_config["destinations"]:
+        label = destination_label(dst_conn_cfg)
+        if label in jobs:
+            raise ValueError(f"Duplicate destination label: {label}")
+        jobs[label] = (get_db_adapter(active_db, {**config, "schemas_to_compare": schemas}, logger), dst_conn_cfg)
 
-        if "html" in report_formats:
-            report_path = config["output"]["html_report"]
-            os.makedirs(os.path.dirname(report_path), exist_ok=True)
-            generate_html_report(diff_report, report_path, logger, src_info, dst_info)
+    fanout_workers = config.get("extraction", {}).get("fanout_workers", 4)
+    defer = defer_definitions(config, [adapter for adapter, _ in jobs.values()])
+    try:
+        extracted = extract_concurrently(jobs, logger, max_workers=fanout_workers, fail_fast=False)
+        if defer and "source" in extracted:
+            with profiler.phase("extract.definitions"):
+                fetch_deferred_definitions(
+                    jobs, extracted, logger, include_unmatched=rename_detection(config), fail_fast=False
+                )
+    finally:
+        for adapter, _ in jobs.values():
+            adapter.close()
+
+    if "source" not in extracted:
+        raise RuntimeError("Source metadata extraction failed; nothing to compare.")
+
+    src_meta = extracted.pop("source")
+    src_fingerprints = fingerprint_metadata(src_meta, config)
+    summaries = []
+    for label, (_, dst_conn_cfg) in jobs.items():
+        if label == "source":
+            continue
+        dst_info = {"server": dst_conn_cfg["server"], "database": dst_conn_cfg["database"]}
+        summary = {"label": label, "destination": dst_info, "counts": {}, "reports": {}}
+        if label not in extracted:
+            summary["status"] = "extraction failed"
+        else:
+            diff_report = compare_metadata(src_meta, extracted.pop(label), config, logger, src_fingerprints)
+            summary["status"] = "ok"
+            summary["counts"] = summarize_diff(diff_report)
+            summary["reports"] = write_reports(diff_report, config, logger, src_info, dst_info, suffix=label)
+        summaries.append(summary)
+
+    summary_path = config.get("output", {}).get("summary_report", "./reports/fanout_summary.html")
+    os.makedirs(os.path.dirname(summary_path), exist_ok=True)
+    with profiler.phase("report.summary"):
+        generate_summary_report(summaries, summary_path, logger, src_info)
+
+def run_snapshot(config, logger, side, output_path):
+    active_db, db_config = get_db_config(config, logger)
+    conn_cfg = db_config[side]
+    # Same schema list as a live run, so snapshots of either side compare like-for-like
+    schemas = db_config["source"].get("schemas", [])
+
+    adapter = get_db_adapter(active_db, {**config, "schemas_to_compare": schemas}, logger)
+    try:
+        with profiler.phase(f"extract.{side}.connect"):
+            adapter.connect(conn_cfg)
+        with profiler.phase(f"extract.{side}.metadata"):
+            metadata = adapter.extract_metadata()
+    finally:
+        adapter.close()
+
+    write_snapshot(output_path, {
+        "db_type": active_db,
+        "server": conn_cfg["server"],
+        "database": conn_cfg["database"],
+        "schemas": schemas,
+        "metadata": metadata
+    })
+    logger.info(f"Snapshot of {side} {conn_cfg['server']}/{conn_cfg['database']} written to: {output_path}")
+
+def run_compare_snapshots(config, logger, src_path, dst_path):
+    with profiler.phase("snapshot.read"):
+        src_snapshot = read_snapshot(src_path)
+        dst_snapshot = read_snapshot(dst_path)
+    if src_snapshot.get("db_type") != dst_snapshot.get("db_type"):
+        logger.warning(
+            f"Comparing snapshots of different database types: "
+            f"{src_snapshot.get('db_type')} vs {dst_snapshot.get('db_type')}"
+        )
+    logger.info(f"Loaded snapshots {src_path} ({src_snapshot['created']}) and {dst_path} ({dst_snapshot['created']})")
+
+    src_info = {"server": src_snapshot.get("server"), "database": src_snapshot.get("database")}
+    dst_info = {"server": dst_snapshot.get("server"), "database": dst_snapshot.get("database")}
 
-        if "pdf" in report_formats:
-            report_path = config["output"]["pdf_report"]
-            os.makedirs(os.path.dirname(report_path), exist_ok=True)
-            generate_pdf_report(diff_report, report_path, logger, src_info, dst_info)
+    # Snapshots record the database type they were taken from; active_db may name another one
+    diff_report = compare_metadata(
+        src_snapshot["metadata"], dst_snapshot["metadata"], config, logger, dialect=src_snapshot.get("db_type")
+    )
+    write_reports(diff_report, config, logger, src_info, dst_info)
 
-        logger.info(f"Schema diff completed. Report saved to: {report_formats}")
+def run_command(args, config, logger):
+    if args.command == "snapshot":
+        run_snapshot(config, logger, args.side, args.output)
+    elif args.command == "compare":
+        run_compare_snapshots(config, logger, args.source, args.destination)
+    elif config.get(config.get("active_db"), {}).get("destinations"):
+        run_fanout(config, logger)
+    else:
+        run_live(config, logger)
+
+def run_profiled(args, config, logger):
+    """Run the command with a RunProfile active and write it (and any Python profiler output) afterwards."""
+    profiling_cfg = config.get("profiling", {})
+    stem = os.path.join(
+        profiling_cfg.get("directory", "./reports/profiles"),
+        f"run_profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    )
+    os.makedirs(os.path.dirname(stem), exist_ok=True)
+    python_profiler = args.python_profiler or profiling_cfg.get("python_profiler")
+
+    profile = profiler.start(args.command or "live")
+    try:
+        if python_profiler:
+            output_path = stem + (".prof" if python_profiler == "cprofile" else ".html")
+            with profiler.python_profiler(python_profiler, output_path):
+                run_command(args, config, logger)
+            logger.info(f"{python_profiler} output written to: {output_path}")
+        else:
+            run_command(args, config, logger)
+    finally:
+        profiler.stop()
+        profile.write(stem + ".json")
+        logger.info(f"Run profile written to: {stem}.json")
+
+def main(argv=None):
+    args = parse_args(argv)
+    logger = setup_logger()
+    config = load_config()
+    logger.info("Starting DB schema comparison...")
+    configure_templates(config.get("output", {}).get("template_cache"))
+
+    try:
+        if args.profile or args.python_profiler or config.get("profiling", {}).get("enabled"):
+            run_profiled(args, config, logger)
+        else:
+            run_command(args, config, logger)
     except Exception as e:
         logger.exception(f"Unhandled error during execution: {str(e)}")
-    finally:
-        if 'src_adapter' in locals(): src_adapter.close()
-        if 'dst_adapter' in locals(): dst_adapter.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,166 @@
+"""
+Compact in-memory records for the high-volume parts of extracted metadata: table columns, index
+columns and constraint columns. A record has one __slots__ field per key instead of a dict, and its
+string values are interned, so repeated names and type names ("varchar", "int", "id") are stored once.
+Records are mappings with a fixed set of keys, so DeepDiff, fingerprints and the report templates
+treat them like the dicts they replace.
+"""
+import keyword
+import sys
+from collections.abc import Mapping, MutableMapping
+
+_record_types = {}
+# Shared int objects; CPython only caches -5..256, and lengths like 510 or 8000 repeat per column
+_ints = {}
+
+
+def _share(value):
+    if type(value) is str:
+        return sys.intern(value)
+    if type(value) is int:
+        return _ints.setdefault(value, value)
+    return value
+
+
+class Record(MutableMapping):
+    # A MutableMapping rather than a Mapping because that is what DeepDiff/DeepHash treat as a dict;
+    # fields can be reassigned, but not added or removed
+    __slots__ = ()
+    _fields = ()
+
+    def __getitem__(self, key):
+        if key not in self._fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self._fields:
+            raise KeyError(key)
+        setattr(self, key, _share(value))
+
+    def __delitem__(self, key):
+        raise TypeError("Record fields cannot be removed")
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __contains__(self, key):
+        return key in self._fields
+
+    def _values(self):
+        return tuple(getattr(self, field) for field in self._fields)
+
+    def items(self):
+        return list(zip(self._fields, self._values()))
+
+    def __eq__(self, other):
+        if type(other) is type(self):
+            return self._values() == other._values()
+        return Mapping.__eq__(self, other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.as_dict())
+
+    def __reduce__(self):
+        return _rebuild, (self._fields, self._values())
+
+    def as_dict(self):
+        return dict(zip(self._fields, self._values()))
+
+
+def _valid_fields(fields):
+    return all(type(f) is str and f.isidentifier() and not keyword.iskeyword(f) and f not in _RESERVED for f in fields)
+
+
+def record_type(fields):
+    """The Record class with the given field names; one class per field tuple, shared by all callers."""
+    fields = tuple(fields)
+    cls = _record_types.get(fields)
+    if cls is None:
+        if not _valid_fields(fields):
+            raise ValueError(f"Invalid record fields: {fields}")
+        # Generated methods read and assign each slot directly: building millions of records, and
+        # fingerprinting reads the items of every one, so the generic per-field loops are too slow
+        code = "\n".join([
+            f"def __init__(self, {', '.join(fields)}):",
+            *(f"    self.{f} = _share({f})" for f in fields),
+            "def _values(self):",
+            f"    return ({''.join(f'self.{f}, ' for f in fields)})",
+            "def items(self):",
+            f"    return [{', '.join(f'({f!r}, self.{f})' for f in fields)}]"
+        ])
+        generated = {"_share": _share}
+        exec(code, generated)
+        methods = {name: generated[name] for name in ("__init__", "_values", "items")}
+        cls = type("Record", (Record,), {"__module__": __name__, "__slots__": fields, "_fields": fields, **methods})
+        _record_types[fields] = cls
+    return cls
+
+
+# Field names that would shadow Record/Mapping methods or the generated methods' own names
+_RESERVED = set(dir(Record)) | {"self", "_share"}
+
+
+def _rebuild(fields, values):
+    return record_type(fields)(*values)
+
+
+# Phase one of a deferred extraction stores a server-side hash in place of each definition text
+DEFERRED_PREFIX = "deferred-definition:"
+
+
+def deferred_definition(digest):
+    return None if digest is None else DEFERRED_PREFIX + str(digest).lower()
+
+
+def is_deferred(value):
+    """True for a definition-type value (text, or a dict with a "definition") still holding a hash placeholder."""
+    if isinstance(value, Mapping):
+        value = value.get("definition")
+    return isinstance(value, str) and value.startswith(DEFERRED_PREFIX)
+
+
+def json_default(value):
+    """`default` hook for JSON/msgpack encoders: records as plain dicts, anything else as str()."""
+    if isinstance(value, Record):
+        return value.as_dict()
+    return str(value)
+
+
+def _compact_list(items):
+    compacted = []
+    for item in items:
+        if type(item) is dict:
+            fields = tuple(item)
+            cls = _record_types.get(fields) or (record_type(fields) if _valid_fields(fields) else None)
+            if cls is not None:
+                item = cls(*item.values())
+        elif type(item) is str:
+            item = sys.intern(item)
+        compacted.append(item)
+    return compacted
+
+
+def compact_metadata(metadata):
+    """
+    Metadata as the adapters build it, from the plain dicts and lists of e.g. a decoded snapshot:
+    flat dicts inside lists (columns, index and constraint columns) become records. Object-level
+    values such as trigger or routine dicts stay dicts.
+    """
+    compacted = {}
+    for obj_type, objects in metadata.items():
+        if obj_type == "constraints":
+            compacted[obj_type] = {
+                kind: {key: _compact_list(value) if type(value) is list else value for key, value in entries.items()}
+                for kind, entries in objects.items()
+            }
+        else:
+            compacted[obj_type] = {
+                key: _compact_list(value) if type(value) is list else value for key, value in objects.items()
+            }
+    return compacted
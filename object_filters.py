@@ -0,0 +1,104 @@
+"""
+Include/exclude rules for object names, per object type, from the "filters" config section:
+
+    "filters": {"tables": {"exclude": ["tmp_*", "*_bak"]}, "views": {"include": ["rpt_*", "re:^v_(sales|hr)_"]}}
+
+Patterns are case-insensitive globs (* and ?), or regular expressions prefixed with "re:". They match
+the object's own name, without the schema. Constraints, indexes and triggers also follow the rules
+of their table.
+"""
+import fnmatch
+import re
+
+REGEX_PREFIX = "re:"
+# Types whose keys are "schema.table.name" (constraints are keyed by their table)
+CHILD_TYPES = ("constraints", "indexes", "triggers")
+# MySQL/PostgreSQL extract procedures and functions together as "routines", tagged with their type
+ROUTINE_TYPES = {"PROCEDURE": "stored_procedures", "FUNCTION": "functions"}
+LIKE_ESCAPE = "!"
+
+
+def glob_to_like(glob):
+    """The LIKE pattern (escaped with LIKE_ESCAPE) equivalent to a glob, or None for character classes."""
+    if "[" in glob:
+        return None
+    like = []
+    for char in glob:
+        if char == "*":
+            like.append("%")
+        elif char == "?":
+            like.append("_")
+        elif char in ("%", "_", LIKE_ESCAPE):
+            like.append(LIKE_ESCAPE + char)
+        else:
+            like.append(char)
+    return "".join(like)
+
+
+class NameRules:
+    """The compiled include/exclude patterns of one object type."""
+
+    def __init__(self, include=(), exclude=()):
+        self.include = [self._compile(pattern) for pattern in include]
+        self.exclude = [self._compile(pattern) for pattern in exclude]
+
+    @staticmethod
+    def _compile(pattern):
+        # (LIKE pattern or None, matcher); regular expressions match anywhere, globs the whole name
+        if pattern.startswith(REGEX_PREFIX):
+            return None, re.compile(pattern[len(REGEX_PREFIX):], re.IGNORECASE).search
+        return glob_to_like(pattern), re.compile(fnmatch.translate(pattern), re.IGNORECASE).match
+
+    def matches(self, name):
+        if self.include and not any(match(name) for _, match in self.include):
+            return False
+        return not any(match(name) for _, match in self.exclude)
+
+    def like_patterns(self):
+        """
+        (includes, excludes) that can be pushed down as LIKE / NOT LIKE. Includes are all or nothing:
+        a regex include could match names no LIKE pattern does, so then none are pushed down.
+        """
+        includes = [like for like, _ in self.include]
+        if None in includes:
+            includes = []
+        return includes, [like for like, _ in self.exclude if like is not None]
+
+
+def object_rules(config):
+    """{obj_type: NameRules} for every object type with rules in config["filters"]."""
+    rules = {}
+    for obj_type, spec in (config.get("filters") or {}).items():
+        if spec.get("include") or spec.get("exclude"):
+            rules[obj_type] = NameRules(spec.get("include", ()), spec.get("exclude", ()))
+    return rules
+
+
+def _names(obj_type, key):
+    # (table, own name) of a metadata key; the schema never takes part in matching
+    parts = key.split(".", 2)
+    if obj_type == "constraints":
+        return parts[-1], None
+    if obj_type in CHILD_TYPES and len(parts) == 3:
+        return parts[1], parts[2]
+    return None, parts[-1]
+
+
+def _keep(obj_type, key, value, rules):
+    table, name = _names(obj_type, key)
+    if table is not None and "tables" in rules and not rules["tables"].matches(table):
+        return False
+    if obj_type == "routines" and isinstance(value, dict):
+        obj_type = ROUTINE_TYPES.get(str(value.get("type")).upper(), obj_type)
+    return name is None or obj_type not in rules or rules[obj_type].matches(name)
+
+
+def _filter(obj_type, objects, rules):
+    return {key: value for key, value in objects.items() if _keep(obj_type, key, value, rules)}
+
+
+def filter_objects(obj_type, objects, rules):
+    """One extractor's result without the objects the rules leave out."""
+    if obj_type == "constraints":
+        return {kind: _filter(obj_type, entries, rules) for kind, entries in objects.items()}
+    return _filter(obj_type, objects, rules)
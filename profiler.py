@@ -0,0 +1,176 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # not available on Windows; peak RSS is then left out of the profile
+    resource = None
+
+# The profile of the running command, or None when profiling is off; see start()
+_current = None
+
+
+def current():
+    return _current
+
+
+def phase(name):
+    """Time a block as phase `name` of the current profile; a no-op when profiling is off."""
+    profile = _current
+    return profile.phase(name) if profile is not None else nullcontext()
+
+
+def start(command):
+    global _current
+    _current = RunProfile(command)
+    return _current
+
+
+def stop():
+    global _current
+    profile, _current = _current, None
+    return profile
+
+
+def _peak_rss_mb(who):
+    usage = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(usage / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+def _row_bytes(rows):
+    # Approximate payload size: text and binary values by length, anything else as 8 bytes
+    total = 0
+    for row in rows:
+        for value in (row.values() if isinstance(row, dict) else row):
+            if isinstance(value, (str, bytes)):
+                total += len(value)
+            elif value is not None:
+                total += 8
+    return total
+
+
+class ProfiledCursor:
+    """DB-API cursor wrapper counting round trips (execute and fetch calls), rows and bytes fetched."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.stats = {"round_trips": 0, "rows": 0, "bytes": 0}
+
+    def _fetched(self, rows):
+        self.stats["round_trips"] += 1
+        self.stats["rows"] += len(rows)
+        self.stats["bytes"] += _row_bytes(rows)
+        return rows
+
+    def execute(self, *args, **kwargs):
+        self.stats["round_trips"] += 1
+        return self._cursor.execute(*args, **kwargs)
+
+    def fetchmany(self, *args, **kwargs):
+        return self._fetched(self._cursor.fetchmany(*args, **kwargs))
+
+    def fetchall(self):
+        return self._fetched(self._cursor.fetchall())
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._fetched([row])
+        return row
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class RunProfile:
+    """
+    Timings and counters of one command, collected from the extraction threads, the comparison and
+    the report writers, and written as JSON by write().
+    """
+
+    def __init__(self, command):
+        self.command = command
+        self.started = datetime.now()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self.phases = {}
+        self.extractors = []
+        self.comparison = {}
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_phase(name, time.perf_counter() - start)
+
+    def record_phase(self, name, seconds):
+        with self._lock:
+            entry = self.phases.setdefault(name, {"seconds": 0.0, "calls": 0})
+            entry["seconds"] += seconds
+            entry["calls"] += 1
+
+    def record_extractor(self, database, extractor, seconds, stats):
+        with self._lock:
+            self.extractors.append({"database": database, "extractor": extractor, "seconds": seconds, **stats})
+
+    def record_comparison(self, obj_type, **fields):
+        with self._lock:
+            entry = self.comparison.setdefault(obj_type, {})
+            for key, value in fields.items():
+                entry[key] = entry.get(key, 0) + value
+
+    def to_dict(self):
+        with self._lock:
+            profile = {
+                "command": self.command,
+                "started": self.started.isoformat(),
+                "wall_seconds": time.perf_counter() - self._start,
+                "phases": dict(self.phases),
+                "extractors": list(self.extractors),
+                "comparison": dict(self.comparison)
+            }
+        if resource is not None:
+            profile["peak_rss_mb"] = {
+                "self": _peak_rss_mb(resource.RUSAGE_SELF),
+                "children": _peak_rss_mb(resource.RUSAGE_CHILDREN)
+            }
+        return profile
+
+    def write(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+@contextmanager
+def python_profiler(kind, output_path):
+    """Run the block under cProfile (pstats dump) or pyinstrument (HTML) and write the result to output_path."""
+    if kind == "cprofile":
+        import cProfile
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile.dump_stats(output_path)
+    elif kind == "pyinstrument":
+        from pyinstrument import Profiler
+        profile = Profiler()
+        profile.start()
+        try:
+            yield
+        finally:
+            profile.stop()
+            with open(output_path, "w", encoding="utf-8") as f:
+                f.write(profile.output_html())
+    else:
+        raise ValueError(f"Unknown Python profiler: {kind}")
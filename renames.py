@@ -0,0 +1,110 @@
+import re
+from collections.abc import Mapping
+from utils.hashlib import canonicalize, fingerprint
+from utils.minhash import LSHIndex, minhash
+from utils.sql_normalizer import normalize_sql
+
+# Definitions are compared as sets of 3-token shingles, so reordered or edited lines only change
+# the shingles they touch
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+SHINGLE_SIZE = 3
+# LSH buckets shared by more objects than this are boilerplate (e.g. the same two-column table many
+# times) and would make matching quadratic; identical objects are already paired before LSH
+MAX_BUCKET = 50
+
+def _shingles(text):
+    tokens = _TOKEN.findall(normalize_sql(text, casefold=True))
+    if len(tokens) <= SHINGLE_SIZE:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+def object_tokens(obj):
+    """
+    The token set an object is compared by: definition shingles for module text, one signature per
+    item (e.g. "column + data type + length") for lists such as table columns, one per key for dicts.
+    """
+    if isinstance(obj, str):
+        return _shingles(obj)
+    if isinstance(obj, Mapping):
+        tokens = set()
+        for key, value in obj.items():
+            if key == "definition" and isinstance(value, str):
+                tokens |= _shingles(value)
+            else:
+                tokens.add(f"{key}={canonicalize(value)}")
+        return tokens
+    if isinstance(obj, (list, tuple)):
+        return {canonicalize(item) for item in obj}
+    return {canonicalize(obj)}
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+def _local_name(key):
+    return key.split(".", 1)[-1]
+
+def find_renames(missing, extra, threshold=0.8):
+    """
+    Pair objects missing from the destination with extra destination objects that are likely the
+    same object renamed or moved to another schema. `missing` and `extra` map keys to objects.
+    Returns [(source_key, destination_key, similarity)], each key used at most once.
+
+    Identical objects are paired first by fingerprint. The rest are paired through a MinHash LSH
+    index over the extra objects' token sets, so only objects sharing a bucket are scored (exact
+    Jaccard similarity), never all missing x extra pairs.
+    """
+    pairs = []
+    by_fingerprint = {}
+    for key, obj in extra.items():
+        by_fingerprint.setdefault(fingerprint(obj), []).append(key)
+    unmatched_missing = {}
+    for key, obj in missing.items():
+        same = by_fingerprint.get(fingerprint(obj))
+        if same:
+            match = next((candidate for candidate in same if _local_name(candidate) == _local_name(key)), same[0])
+            same.remove(match)
+            pairs.append((key, match, 1.0))
+        else:
+            unmatched_missing[key] = obj
+    matched_extra = {dst for _, dst, _ in pairs}
+
+    index = LSHIndex()
+    extra_tokens = {}
+    for key, obj in extra.items():
+        if key in matched_extra:
+            continue
+        tokens = object_tokens(obj)
+        signature = minhash(tokens)
+        if signature is not None:
+            extra_tokens[key] = tokens
+            index.add(key, signature)
+
+    scored = []
+    for key, obj in unmatched_missing.items():
+        tokens = object_tokens(obj)
+        signature = minhash(tokens)
+        if signature is None:
+            continue
+        for candidate in index.candidates(signature, MAX_BUCKET):
+            similarity = jaccard(tokens, extra_tokens[candidate])
+            if similarity >= threshold:
+                # Ties go to the pair whose names agree after the schema (a move), then by name
+                scored.append((-similarity, _local_name(key) != _local_name(candidate), key, candidate))
+
+    used_missing = set()
+    for negative_similarity, _, key, candidate in sorted(scored):
+        if key in used_missing or candidate in matched_extra:
+            continue
+        pairs.append((key, candidate, -negative_similarity))
+        used_missing.add(key)
+        matched_extra.add(candidate)
+    return pairs
+
+def rename_entry(source_key, destination_key, similarity):
+    """A "renamed" report entry; kind is "moved" when only the schema differs."""
+    return {
+        "source": source_key,
+        "destination": destination_key,
+        "similarity": round(similarity, 3),
+        "kind": "moved" if _local_name(source_key) == _local_name(destination_key) else "renamed"
+    }
@@ -1,36 +1,169 @@
-from jinja2 import Environment, FileSystemLoader
-from weasyprint import HTML
+from concurrent.futures import ProcessPoolExecutor
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+import base64
+import gzip
+import io
 import os
 import json
+import shutil
+import sys
+import tempfile
+import threading
+import time
 from datetime import datetime
+from metadata_model import json_default
 
-def generate_html_report(diff_report, output_path, logger, src_info=None, dst_info=None):
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+
+# Shared by every report generated in this process; see configure_templates()
+_environment = None
+_environment_lock = threading.Lock()
+
+def configure_templates(bytecode_cache_dir=None):
+    """
+    Replace the shared template environment. With bytecode_cache_dir, compiled templates are also
+    cached on disk, so later processes of the same deployment skip parsing and compiling them.
+    """
+    global _environment
+    bytecode_cache = None
+    if bytecode_cache_dir:
+        os.makedirs(bytecode_cache_dir, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
+    with _environment_lock:
+        _environment = Environment(loader=FileSystemLoader(TEMPLATE_DIR), bytecode_cache=bytecode_cache)
+        return _environment
+
+def get_template(name):
+    # Templates are compiled once per environment and reused until their file changes
+    env = _environment or configure_templates()
+    return env.get_template(name)
+
+def _write_html(template, context, output_path, streaming, buffer_size):
+    with open(output_path, "w", encoding="utf-8") as f:
+        if streaming:
+            # Render template events straight into the file, buffer_size at a time,
+            # so the full document never exists in memory
+            stream = template.stream(**context)
+            stream.enable_buffering(buffer_size)
+            stream.dump(f)
+        else:
+            f.write(template.render(**context))
+
+def generate_html_report(diff_report, output_path, logger, src_info=None, dst_info=None, streaming=True, buffer_size=64):
+    generate_html_reports([(diff_report, output_path, src_info, dst_info)], logger, streaming, buffer_size)
+
+def generate_html_reports(reports, logger, streaming=True, buffer_size=64):
+    """
+    Render every (diff_report, output_path, src_info, dst_info) of `reports` with one compiled template.
+    `reports` may be a generator, so diff reports can be produced and released one at a time.
+    """
+    template = None
+    timestamp = datetime.now().strftime("%d %b %Y %H:%M:%S")
+    for diff_report, output_path, src_info, dst_info in reports:
+        try:
+            if template is None:
+                template = get_template("report_html_template.html")
+            context = {
+                "diff": diff_report,
+                "source": src_info,
+                "destination": dst_info,
+                "timestamp": timestamp
+            }
+            _write_html(template, context, output_path, streaming, buffer_size)
+            logger.info(f"HTML report generated at: {output_path}")
+        except Exception as e:
+            logger.exception(f"Failed to generate HTML report: {str(e)}")
+
+def _write_shard(shard_dir, shard_id, payload, encoder):
+    # A script rather than a .json file: <script src> also loads from file://, where fetch() is blocked
+    data = base64.b64encode(gzip.compress(encoder.encode(payload).encode("utf-8"), 6)).decode("ascii")
+    with open(os.path.join(shard_dir, f"{shard_id}.js"), "w", encoding="ascii") as f:
+        f.write(f'schemaDiffShard("{shard_id}","{data}");\n')
+
+def generate_lazy_html_report(diff_report, output_path, logger, src_info=None, dst_info=None, page_size=500, shard_bytes=262144):
+    """
+    Write a small index page with per-type counts, and the object lists and mismatch details as
+    gzip-compressed shards in <name>_files/, loaded by the page only when a section is expanded.
+    List shards hold page_size objects; detail shards are cut at about shard_bytes of uncompressed JSON.
+    """
     try:
-        #print(json.dumps(diff_report, indent=2))
-        template_dir = os.path.join(os.path.dirname(__file__), "templates")
-        env = Environment(loader=FileSystemLoader(template_dir))
-        template = env.get_template("report_html_template.html")
-
-        context = {
-            "diff": diff_report,
-            "source": src_info,
-            "destination": dst_info,
-            "timestamp": datetime.now().strftime("%d %b %Y %H:%M:%S")
-        }
+        root, _ = os.path.splitext(output_path)
+        shard_dir = f"{root}_files"
+        os.makedirs(shard_dir, exist_ok=True)
+        for name in os.listdir(shard_dir):
+            if name.endswith(".js"):
+                os.remove(os.path.join(shard_dir, name))
+
+        encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, default=json_default)
+        detail_count = 0
+        detail, detail_size = [], 0
+
+        def flush_detail():
+            nonlocal detail_count, detail, detail_size
+            if detail:
+                _write_shard(shard_dir, f"d{detail_count}", detail, encoder)
+                detail_count += 1
+                detail, detail_size = [], 0
 
-        html_content = template.render(**context)
+        def add_entry(entries, status, name, rows=None):
+            # Entries with diff rows point at the detail shard holding them
+            nonlocal detail_size
+            if rows is None:
+                entries.append([status, name])
+                return
+            size = len(encoder.encode(rows))
+            if detail and detail_size + size > shard_bytes:
+                flush_detail()
+            entries.append([status, name, f"d{detail_count}", len(detail)])
+            detail.append(rows)
+            detail_size += size
+
+        types = []
+        for type_index, (obj_type, diffs) in enumerate(diff_report.items()):
+            entries = [["missing", key] for key in diffs["missing_in_dest"]]
+            entries += [["extra", key] for key in diffs["extra_in_dest"]]
+            for entry in diffs.get("renamed", []):
+                add_entry(
+                    entries, "renamed", f"{entry['source']} -> {entry['destination']} ({entry['similarity']:.0%} similar)",
+                    entry.get("diffs")
+                )
+            entries += [
+                ["affected", f"{entry['object']} (depends on {entry['root']})"] for entry in diffs.get("affected", [])
+            ]
+            for mismatch in diffs["mismatched"]:
+                add_entry(entries, "mismatched", mismatch["object"], mismatch["diffs"])
+
+            pages = 0
+            for start in range(0, len(entries), page_size):
+                _write_shard(shard_dir, f"l{type_index}_{pages}", entries[start:start + page_size], encoder)
+                pages += 1
+            types.append({"name": obj_type, "counts": summarize_diff({obj_type: diffs})[obj_type], "pages": pages})
+        flush_detail()
 
         with open(output_path, "w", encoding="utf-8") as f:
-            f.write(html_content)
+            f.write(get_template("report_lazy_template.html").render(
+                types=types,
+                shard_dir=os.path.basename(shard_dir),
+                source=src_info,
+                destination=dst_info,
+                timestamp=datetime.now().strftime("%d %b %Y %H:%M:%S")
+            ))
 
-        logger.info(f"HTML report generated at: {output_path}")
+        logger.info(f"Lazy HTML report generated at: {output_path} ({detail_count} detail shard(s) in {shard_dir})")
     except Exception as e:
-        logger.exception(f"Failed to generate HTML report: {str(e)}")
+        logger.exception(f"Failed to generate lazy HTML report: {str(e)}")
 
-def generate_pdf_report(diff_report, output_path, logger, src_info=None, dst_info=None):
+def generate_pdf_report(diff_report, output_path, logger, src_info=None, dst_info=None, pdf_cfg=None):
+    pdf_cfg = pdf_cfg or {}
+    split = pdf_cfg.get("split", "none")
     try:
-        env = Environment(loader=FileSystemLoader("templates"))
-        template = env.get_template("report_pdf_template.html")
+        if split != "none":
+            return generate_split_pdf_report(diff_report, output_path, logger, src_info, dst_info, pdf_cfg)
+
+        # Imported lazily: WeasyPrint needs Cairo/Pango and is only required for PDF output
+        from weasyprint import HTML
+
+        template = get_template("report_pdf_template.html")
 
         context = template.render(
             diff=diff_report,
@@ -44,4 +177,261 @@ def generate_pdf_report(diff_report, output_path, logger, src_info=None, dst_inf
         HTML(string=context).write_pdf(output_path)
         logger.info(f"PDF report generated at: {output_path}")
     except Exception as e:
-        logger.exception(f"Failed to generate PDF report: {str(e)}")
\ No newline at end of file
+        logger.exception(f"Failed to generate PDF report: {str(e)}")
+
+def _diff_rows(diffs):
+    # Layout cost of one object type's entries: one row per missing/extra/renamed/affected object, plus
+    # one row per attribute (or per line of definition diff hunks) for every mismatched or edited renamed object
+    for kind in ("missing_in_dest", "extra_in_dest", "affected"):
+        for item in diffs.get(kind, []):
+            yield kind, item, 1
+    for kind in ("renamed", "mismatched"):
+        for item in diffs.get(kind, []):
+            yield kind, item, 1 + _rows_cost(item.get("diffs", ()))
+
+def _rows_cost(rows):
+    return sum(row["diff"].count("\n") + 1 if "diff" in row else 1 for row in rows)
+
+def split_diff_report(diff_report, split="rows", rows_per_part=2000):
+    """
+    Split a diff report into parts of the same shape. split="object_type" starts a new part for
+    every object type, split="rows" packs object types together; either way a part is closed once it
+    reaches rows_per_part rows (0 for no limit). A mismatched object is never split across parts.
+    """
+    parts = []
+    current, rows = {}, 0
+
+    def close_part():
+        nonlocal current, rows
+        if current:
+            parts.append(current)
+        current, rows = {}, 0
+
+    for obj_type, diffs in diff_report.items():
+        if split == "object_type":
+            close_part()
+        if "info" in diffs:
+            current[obj_type] = dict(diffs)
+            rows += 1
+            continue
+        for kind, item, cost in _diff_rows(diffs):
+            if rows_per_part and rows and rows + cost > rows_per_part:
+                close_part()
+            section = current.setdefault(obj_type, {"missing_in_dest": [], "extra_in_dest": [], "renamed": [], "mismatched": [], "affected": []})
+            section[kind].append(item)
+            rows += cost
+    close_part()
+    return parts
+
+def _render_pdf_part(template_name, context, path, template_cache=None):
+    # Runs in a worker process: the part's HTML and WeasyPrint's layout memory only ever exist there,
+    # and are released when the part is done
+    from weasyprint import HTML
+    configure_templates(template_cache)
+    HTML(string=get_template(template_name).render(**context)).write_pdf(path)
+    return path
+
+def _render_pdf_parts(tasks, workers):
+    """
+    Run _render_pdf_part for every (template_name, context, path, template_cache) task, at most
+    `workers` at a time, each in a process of its own; returns the rendered paths in task order.
+    """
+    if sys.version_info >= (3, 11):
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), max_tasks_per_child=1) as executor:
+            futures = [executor.submit(_render_pdf_part, *task) for task in tasks]
+            return [future.result() for future in futures]
+    # max_tasks_per_child needs Python 3.11: give every task a short-lived single-process executor
+    rendered = []
+    for start in range(0, len(tasks), workers):
+        batch = tasks[start:start + workers]
+        executors = [ProcessPoolExecutor(max_workers=1) for _ in batch]
+        try:
+            futures = [executor.submit(_render_pdf_part, *task) for executor, task in zip(executors, batch)]
+            rendered += [future.result() for future in futures]
+        finally:
+            for executor in executors:
+                executor.shutdown()
+    return rendered
+
+def _merge_pdfs(paths, output_path):
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for path in paths:
+        writer.append(path)
+    with open(output_path, "wb") as f:
+        writer.write(f)
+    writer.close()
+
+def generate_split_pdf_report(diff_report, output_path, logger, src_info=None, dst_info=None, pdf_cfg=None):
+    """
+    Render the PDF report in bounded parts (see split_diff_report), each in its own worker process.
+    With pdf.merge the cover and parts are concatenated into output_path (needs pypdf); otherwise
+    output_path is a cover page listing the volumes written next to it as <name>_partNNN.pdf.
+    """
+    pdf_cfg = pdf_cfg or {}
+    timestamp = datetime.now().strftime("%d %b %Y %H:%M:%S")
+
+    parts = split_diff_report(diff_report, pdf_cfg.get("split", "rows"), pdf_cfg.get("rows_per_part", 2000))
+    merge = pdf_cfg.get("merge", True)
+    if merge:
+        try:
+            import pypdf  # noqa: F401
+        except ImportError:
+            logger.warning("pypdf is not installed; writing the PDF report as a volume set instead.")
+            merge = False
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    root, ext = os.path.splitext(output_path)
+    work_dir = tempfile.mkdtemp(dir=os.path.dirname(output_path) or ".") if merge else None
+    part_paths = [
+        os.path.join(work_dir, f"part{number:03d}{ext}") if merge else f"{root}_part{number:03d}{ext}"
+        for number in range(1, len(parts) + 1)
+    ]
+
+    volumes = [
+        {
+            "number": number,
+            "file": os.path.basename(path),
+            "object_types": list(part),
+            "rows": sum(cost for diffs in part.values() for _, _, cost in _diff_rows(diffs))
+        }
+        for number, (part, path) in enumerate(zip(parts, part_paths), start=1)
+    ]
+    cover_context = {
+        "counts": summarize_diff(diff_report),
+        "volumes": volumes,
+        "merged": merge,
+        "source": src_info,
+        "destination": dst_info,
+        "timestamp": timestamp
+    }
+    cover_path = os.path.join(work_dir, f"cover{ext}") if merge else output_path
+    # Workers compile the templates themselves; share the on-disk template cache if one is configured
+    template_cache = getattr(getattr(_environment, "bytecode_cache", None), "directory", None)
+
+    workers = pdf_cfg.get("workers") or os.cpu_count()
+    start = time.perf_counter()
+    try:
+        # Workers are sent a part's rows, which the parent already holds as part of diff_report, and
+        # render its HTML themselves; one process per part releases the render's memory when the
+        # part is done
+        tasks = [("report_pdf_cover_template.html", cover_context, cover_path, template_cache)]
+        for volume, part, path in zip(volumes, parts, part_paths):
+            context = {
+                "diff": part,
+                "part": {"number": volume["number"], "total": len(parts)},
+                "source": src_info,
+                "destination": dst_info,
+                "timestamp": timestamp
+            }
+            tasks.append(("report_pdf_template.html", context, path, template_cache))
+        rendered = _render_pdf_parts(tasks, workers)
+
+        if merge:
+            _merge_pdfs(rendered, output_path)
+    finally:
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    logger.info(
+        f"PDF report generated at: {output_path} ({len(parts)} part(s) on {workers} worker process(es) "
+        f"in {time.perf_counter() - start:.2f}s{'' if merge else ', written as a volume set'})"
+    )
+
+def summarize_diff(diff_report):
+    return {
+        obj_type: {
+            "missing": len(diffs["missing_in_dest"]),
+            "extra": len(diffs["extra_in_dest"]),
+            "renamed": len(diffs.get("renamed", [])),
+            "mismatched": len(diffs["mismatched"]),
+            "affected": len(diffs.get("affected", []))
+        }
+        for obj_type, diffs in diff_report.items()
+    }
+
+JSONL_EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+
+def iter_diff_records(diff_report):
+    """
+    One flat record per missing, extra, renamed, mismatched or dependency-affected object of a
+    compare_metadata() result.
+    """
+    for obj_type, diffs in diff_report.items():
+        for key in diffs["missing_in_dest"]:
+            yield {"object_type": obj_type, "status": "missing", "object": key}
+        for key in diffs["extra_in_dest"]:
+            yield {"object_type": obj_type, "status": "extra", "object": key}
+        for entry in diffs.get("renamed", []):
+            yield {"object_type": obj_type, "status": "renamed", "object": entry["source"], **entry}
+        for mismatch in diffs["mismatched"]:
+            yield {"object_type": obj_type, "status": "mismatched", "object": mismatch["object"], "diffs": mismatch["diffs"]}
+        for entry in diffs.get("affected", []):
+            yield {"object_type": obj_type, "status": "affected", **entry}
+
+def _open_jsonl(output_path, compression, logger):
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            logger.warning("zstandard is not installed; compressing the JSON Lines report with gzip instead.")
+            compression = "gzip"
+        else:
+            path = output_path + JSONL_EXTENSIONS["zstd"]
+            writer = zstandard.ZstdCompressor(level=3).stream_writer(open(path, "wb"), closefd=True)
+            return path, io.TextIOWrapper(writer, encoding="utf-8")
+    if compression == "gzip":
+        path = output_path + JSONL_EXTENSIONS["gzip"]
+        return path, gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+    if compression:
+        raise ValueError(f"Unsupported JSON Lines compression: {compression}")
+    return output_path, open(output_path, "w", encoding="utf-8")
+
+def generate_jsonl_report(diff_report, output_path, logger, compression=None):
+    """
+    Write the diff as JSON Lines, one record per object, encoding and writing record by record.
+    With compression "gzip" or "zstd" the matching extension is appended; returns the written path.
+    """
+    try:
+        # Metadata records are written as objects; DeepDiff placeholders (e.g. for added list items) as text
+        encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, default=json_default)
+        path, f = _open_jsonl(output_path, compression, logger)
+        count = 0
+        with f:
+            for record in iter_diff_records(diff_report):
+                f.write(encoder.encode(record))
+                f.write("\n")
+                count += 1
+
+        logger.info(f"JSON Lines report with {count} records generated at: {path}")
+        return path
+    except Exception as e:
+        logger.exception(f"Failed to generate JSON Lines report: {str(e)}")
+
+def generate_summary_report(summaries, output_path, logger, src_info=None):
+    try:
+        template = get_template("report_summary_template.html")
+
+        # Keep the first-seen object type order across all destinations
+        object_types = list(dict.fromkeys(obj_type for summary in summaries for obj_type in summary["counts"]))
+        summary_dir = os.path.dirname(os.path.abspath(output_path))
+        for summary in summaries:
+            summary["links"] = {
+                fmt: os.path.relpath(os.path.abspath(path), summary_dir)
+                for fmt, path in summary.get("reports", {}).items()
+            }
+
+        html_content = template.render(
+            summaries=summaries,
+            object_types=object_types,
+            source=src_info,
+            timestamp=datetime.now().strftime("%d %b %Y %H:%M:%S")
+        )
+
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(html_content)
+
+        logger.info(f"Summary report generated at: {output_path}")
+    except Exception as e:
+        logger.exception(f"Failed to generate summary report: {str(e)}")
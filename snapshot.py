@@ -0,0 +1,122 @@
+import gc
+import hashlib
+import json
+import os
+import zlib
+from datetime import datetime
+from metadata_model import compact_metadata, json_default
+
+try:
+    import msgpack
+except ImportError:  # optional: snapshots fall back to JSON encoding
+    msgpack = None
+
+# Bump whenever the metadata layout written by the adapters changes; older files are ignored
+SNAPSHOT_FORMAT_VERSION = 2
+
+# File layout: magic, one codec byte (M = msgpack, J = JSON), zlib-compressed body
+SNAPSHOT_MAGIC = b"DBSNAP"
+
+def _encode(payload):
+    if msgpack is not None:
+        return b"M", msgpack.packb(payload, default=json_default, use_bin_type=True)
+    return b"J", json.dumps(payload, separators=(",", ":"), default=json_default).encode("utf-8")
+
+def _decode(codec, body, path):
+    if codec == b"M":
+        if msgpack is None:
+            raise RuntimeError(f"Snapshot {path} is msgpack-encoded but msgpack is not installed")
+        return msgpack.unpackb(body, raw=False, strict_map_key=False)
+    if codec == b"J":
+        return json.loads(body)
+    raise ValueError(f"Unknown snapshot codec {codec!r} in {path}")
+
+def write_snapshot(path, payload):
+    payload = {**payload, "format_version": SNAPSHOT_FORMAT_VERSION, "created": datetime.now().isoformat()}
+    codec, body = _encode(payload)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(SNAPSHOT_MAGIC + codec)
+        f.write(zlib.compress(body, 1))
+    os.replace(tmp_path, path)
+
+def read_snapshot(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    header_len = len(SNAPSHOT_MAGIC)
+    if data[:header_len] != SNAPSHOT_MAGIC:
+        raise ValueError(f"{path} is not a metadata snapshot")
+    # Decoding and compacting allocate millions of small objects and none of them can be garbage yet;
+    # pausing the cyclic GC avoids repeated full-heap scans while they are built
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        payload = _decode(data[header_len:header_len + 1], zlib.decompress(data[header_len + 1:]), path)
+        if payload.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format {payload.get('format_version')} in {path}")
+        # Same compact records as a live extraction, so cached and live metadata compare alike
+        if "metadata" in payload:
+            payload["metadata"] = compact_metadata(payload["metadata"])
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return payload
+
+def snapshot_cache_path(cache_dir, adapter_name, dbconstr, schemas, object_types, filters=None, deferred=False):
+    key = json.dumps([
+        adapter_name,
+        dbconstr.get("server"),
+        dbconstr.get("port"),
+        dbconstr.get("database"),
+        sorted(schemas),
+        sorted(k for k, enabled in object_types.items() if enabled)
+    ] + ([filters] if filters else []) + (["deferred"] if deferred else []), sort_keys=True)
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:24]
+    return os.path.join(cache_dir, f"{adapter_name.lower()}-{digest}.snap")
+
+def load_cached_snapshot(path, logger):
+    """Return the snapshot payload cached at `path`, or None when missing or unreadable."""
+    if not os.path.exists(path):
+        return None
+    try:
+        return read_snapshot(path)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable snapshot {path}: {e}")
+        return None
+
+def _parent_key(key):
+    # "schema.table.index" -> "schema.table"; top-level keys are their own parent
+    return ".".join(key.split(".", 2)[:2]).lower()
+
+def apply_delta(cached, delta, changed, live, object_level_types=("triggers",)):
+    """
+    Patch cached metadata with a delta extraction.
+
+    Entries whose parent object changed are replaced by the `delta` entries, entries whose parent
+    (or, for `object_level_types`, the object itself) is no longer `live` are dropped.
+    Object keys are matched case-insensitively.
+    """
+    changed = {key.lower() for key in changed}
+    live = {key.lower() for key in live}
+
+    def keep(obj_type, key):
+        parent = _parent_key(key)
+        if parent in changed or parent not in live:
+            return False
+        return obj_type not in object_level_types or key.lower() in live
+
+    def patch(obj_type, entries, fresh):
+        patched = {key: value for key, value in entries.items() if keep(obj_type, key)}
+        patched.update(fresh)
+        return patched
+
+    metadata = {}
+    for obj_type, objects in cached.items():
+        fresh = delta.get(obj_type, {})
+        if obj_type == "constraints":
+            kinds = list(objects) + [kind for kind in fresh if kind not in objects]
+            metadata[obj_type] = {kind: patch(obj_type, objects.get(kind, {}), fresh.get(kind, {})) for kind in kinds}
+        else:
+            metadata[obj_type] = patch(obj_type, objects, fresh)
+    return metadata
@@ -1,5 +1,33 @@
 import hashlib
+from collections.abc import Mapping
+
+_SCALAR_TYPES = {str, int, float, bool, type(None)}
 
 def hash_definition(definition: str) -> str:
     return hashlib.sha256(definition.encode("utf-8")).hexdigest()
 
+def canonicalize(value, ordered=False) -> str:
+    """
+    Order-insensitive, type-preserving text form of extracted metadata.
+    Dict (or metadata record) items and list items are sorted so that two values
+    DeepDiff(ignore_order=True) considers equal always serialize identically; repr() keeps e.g.
+    1, 1.0, True and "1" apart.
+    ordered=True keeps the item order of a top-level list or tuple, for values whose order is compared.
+    """
+    if type(value) in _SCALAR_TYPES:
+        return repr(value)
+    if type(value) is dict or isinstance(value, Mapping):
+        items = sorted([
+            repr(k) + ":" + (repr(v) if type(v) in _SCALAR_TYPES else canonicalize(v))
+            for k, v in value.items()
+        ])
+        return "{" + ",".join(items) + "}"
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [canonicalize(v) for v in value]
+        if not (ordered and isinstance(value, (list, tuple))):
+            items.sort()
+        return type(value).__name__ + "[" + ",".join(items) + "]"
+    return repr(value)
+
+def fingerprint(value, ordered=False) -> str:
+    return hash_definition(canonicalize(value, ordered))
@@ -0,0 +1,64 @@
+"""
+MinHash signatures and a banded LSH index, for finding similar token sets without comparing every pair.
+"""
+
+SIGNATURE_SIZE = 64
+BANDS = 16
+
+_HASH_MASK = (1 << 64) - 1
+
+def minhash(tokens, size=SIGNATURE_SIZE):
+    """
+    One-permutation MinHash of a set of string tokens: each token is hashed once into one of `size`
+    bins, keeping the minimum per bin, and empty bins borrow the next filled bin's value (rotation
+    densification). Two signatures agree in about Jaccard(a, b) of their positions.
+    Uses the built-in hash(), so signatures are only comparable within one process. None for no tokens.
+    """
+    bins = [None] * size
+    for token in tokens:
+        h = hash(token) & _HASH_MASK
+        index, value = h % size, h // size
+        if bins[index] is None or value < bins[index]:
+            bins[index] = value
+    if all(value is None for value in bins):
+        return None
+
+    signature = list(bins)
+    # Offsets above any hashed value keep borrowed values distinct from real ones
+    offset = (_HASH_MASK // size) + 1
+    for index, value in enumerate(bins):
+        if value is None:
+            distance = 1
+            while bins[(index + distance) % size] is None:
+                distance += 1
+            signature[index] = bins[(index + distance) % size] + distance * offset
+    return signature
+
+class LSHIndex:
+    """
+    Buckets signatures by bands of `size // bands` positions; two sets share a bucket with probability
+    1 - (1 - J^rows)^bands, so with 16 bands of 4 a pair at Jaccard 0.8 is found 99.9% of the time,
+    and one at 0.3 only 12%.
+    """
+
+    def __init__(self, bands=BANDS, size=SIGNATURE_SIZE):
+        self.bands = bands
+        self.rows = size // bands
+        self.buckets = {}
+
+    def _keys(self, signature):
+        for band in range(self.bands):
+            yield band, tuple(signature[band * self.rows:(band + 1) * self.rows])
+
+    def add(self, key, signature):
+        for bucket in self._keys(signature):
+            self.buckets.setdefault(bucket, []).append(key)
+
+    def candidates(self, signature, max_bucket=None):
+        """Keys sharing at least one bucket with `signature`; buckets over max_bucket keys are skipped."""
+        found = set()
+        for bucket in self._keys(signature):
+            keys = self.buckets.get(bucket, ())
+            if max_bucket is None or len(keys) <= max_bucket:
+                found.update(keys)
+        return found
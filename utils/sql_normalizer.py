@@ -0,0 +1,141 @@
+import re
+import threading
+from collections import OrderedDict
+
+# The only spans that need token-level care: string literals and quoted identifiers (kept verbatim,
+# so comment markers, whitespace or case inside them are never touched) and comments. Everything
+# between them is plain code, normalized with whole-segment string and regex passes; on SQL Server
+# that includes [name] identifiers that need no quoting, since they cannot contain anything special.
+# Elsewhere [ ] are array subscripts and stay ordinary code.
+# No named groups: they disable the regex engine's first-character scan, which is most of its speed.
+_PROTECTED = re.compile(r"""
+      '[^']*(?:''[^']*)*'
+    | --[^\r\n]*|/\*.*?\*/
+    | "[^"]*(?:""[^"]*)*"|`[^`]*`
+""", re.S | re.X)
+_PROTECTED_SQLSERVER = re.compile(r"""
+      '[^']*(?:''[^']*)*'
+    | --[^\r\n]*|/\*.*?\*/
+    | "[^"]*(?:""[^"]*)*"|\[(?![A-Za-z_][\w$#@]*\])[^\]]*\]|`[^`]*`
+""", re.S | re.X)
+# Dialect whose [name] brackets quote identifiers
+BRACKET_DIALECT = "sqlserver"
+
+_LINE_BREAK = re.compile(r"\r\n?")
+_SIMPLE_IDENTIFIER = re.compile(r"[A-Za-z_][\w$#@]*")
+
+def _collapse_whitespace(code):
+    lines = code.split("\n")
+    collapsed = [" ".join(line.split()) for line in lines]
+    # The first and last lines continue the lines of the literals around this segment: they keep one
+    # separating space and are kept even when empty, so line breaks next to a literal survive
+    lead = " " if code[:1].isspace() else ""
+    trail = " " if code[-1:].isspace() else ""
+    if len(lines) == 1:
+        return (lead + collapsed[0] + trail) if collapsed[0] else (lead or trail)
+    middle = [line for line in collapsed[1:-1] if line]
+    first = lead + collapsed[0] if collapsed[0] else ""
+    last = collapsed[-1] + trail if collapsed[-1] else ""
+    return "\n".join([first, *middle, last])
+
+def _normalize_code(code, collapse_whitespace, strip_brackets, casefold):
+    if "\r" in code:
+        code = _LINE_BREAK.sub("\n", code)
+    if strip_brackets:
+        # Brackets that need to stay were matched by _PROTECTED_SQLSERVER, so any left here can go
+        code = code.replace("[", "").replace("]", "")
+    if collapse_whitespace:
+        code = _collapse_whitespace(code)
+    return code.lower() if casefold else code
+
+class _NormalizedCache:
+    """
+    LRU memo of normalized definitions, bounded by the characters it holds (original plus normalized
+    text), so a long fan-out run keeps the shared source's definitions without keeping every
+    definition it has ever seen.
+    """
+
+    def __init__(self, max_chars):
+        self.max_chars = max_chars
+        self.chars = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        size = len(key[0]) + len(value)
+        if size > self.max_chars:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = value
+            self.chars += size
+            while self.chars > self.max_chars:
+                (text, *_), normalized = self._entries.popitem(last=False)
+                self.chars -= len(text) + len(normalized)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.chars = 0
+
+
+_cache = _NormalizedCache(64 * 2**20)
+
+def clear_cache():
+    _cache.clear()
+
+def normalize_sql(text, strip_comments=True, collapse_whitespace=True, strip_brackets=True, casefold=False, dialect=None):
+    """
+    Normalize a module definition for comparison.
+
+    strip_comments removes -- and /* */ comments; collapse_whitespace turns every run of spaces into
+    one, trims lines and drops blank ones (line breaks are kept so definitions still diff line by line);
+    strip_brackets unquotes `name`, and [name] for the SQL Server dialect, when the name needs no
+    quoting; casefold lower-cases everything outside string literals and quoted identifiers. Line
+    endings always become \\n. Results are memoized in a cache bounded by size (about 64M characters).
+    """
+    if not isinstance(text, str):
+        return text
+    key = (text, strip_comments, collapse_whitespace, strip_brackets, casefold, dialect)
+    normalized = _cache.get(key)
+    if normalized is None:
+        normalized = _normalize(text, strip_comments, collapse_whitespace, strip_brackets, casefold, dialect)
+        _cache.put(key, normalized)
+    return normalized
+
+def _normalize(text, strip_comments, collapse_whitespace, strip_brackets, casefold, dialect):
+    brackets = dialect == BRACKET_DIALECT
+    protected = _PROTECTED_SQLSERVER if brackets else _PROTECTED
+    strip_code_brackets = strip_brackets and brackets
+    pieces = []
+    code = []
+    position = 0
+    for match in protected.finditer(text):
+        code.append(text[position:match.start()])
+        position = match.end()
+        token = match.group()
+
+        if token[0] in "-/" and strip_comments:
+            # A removed comment still separates the code around it
+            code.append(" ")
+            continue
+        if token[0] == "`" and strip_brackets and _SIMPLE_IDENTIFIER.fullmatch(token, 1, len(token) - 1):
+            code.append(token[1:-1])
+            continue
+
+        pieces.append(_normalize_code("".join(code), collapse_whitespace, strip_code_brackets, casefold))
+        pieces.append(token)
+        code = []
+    code.append(text[position:])
+    pieces.append(_normalize_code("".join(code), collapse_whitespace, strip_code_brackets, casefold))
+
+    normalized = "".join(pieces)
+    return normalized.strip() if collapse_whitespace else normalized